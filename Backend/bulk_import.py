@@ -0,0 +1,456 @@
+import io
+import csv
+import json
+import time
+import uuid
+import queue
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from queries import registry
+import stats
+
+try:
+    import python_multipart as multipart
+    from python_multipart.multipart import parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    import multipart
+    from multipart.multipart import parse_options_header
+
+# Columns of actors_movies_tmdb.csv and the row fields they map to. NDJSON
+# records may use either the column names or the field names.
+CSV_COLUMNS = {
+    "Name": "name",
+    "Date of Birth": "date_of_birth",
+    "Gender": "gender",
+    "Date of Death": "date_of_death",
+    "Movie Title": "movie_title",
+    "Year": "year",
+}
+FIELDS = tuple(CSV_COLUMNS.values())
+FORMATS = ("csv", "ndjson")
+
+# Placeholders the scrapers write for missing values
+EMPTY_VALUES = {"", "N/A"}
+
+# Only the first few failures are kept with their line numbers
+MAX_ERROR_SAMPLES = 20
+# Upload chunks in flight between the request and the import thread; once the
+# import falls this far behind, reading the request body waits for it
+UPLOAD_QUEUE_CHUNKS = 64
+
+
+class RowError(ValueError):
+    """Raised for a record that cannot be imported."""
+
+
+class UploadError(ValueError):
+    """Raised for a request body that does not carry a file to import."""
+
+
+class ImportBusyError(Exception):
+    """Raised for an upload arriving while this worker is already importing."""
+
+
+def detect_format(filename, content_type=None, requested=None):
+    """Pick csv or ndjson from an explicit choice, the file name or the content type."""
+    if requested:
+        if requested not in FORMATS:
+            raise ValueError(f"Unsupported import format: {requested}")
+        return requested
+    name = (filename or "").lower()
+    if name.endswith((".ndjson", ".jsonl")) or (content_type or "").endswith("ndjson"):
+        return "ndjson"
+    return "csv"
+
+
+def normalise(record):
+    row = {}
+    for key, value in record.items():
+        field = CSV_COLUMNS.get(key, key)
+        if field not in FIELDS:
+            continue
+        if isinstance(value, str):
+            value = value.strip()
+        row[field] = None if value is None or value in EMPTY_VALUES else value
+
+    if not row.get("name"):
+        raise RowError("missing actor name")
+    year = row.get("year")
+    if year is not None:
+        try:
+            row["year"] = int(year)
+        except (TypeError, ValueError):
+            raise RowError(f"invalid year {year!r}")
+    for field in FIELDS:
+        row.setdefault(field, None)
+    return row
+
+
+def read_records(file, format):
+    """Yield (line number, record, error) one record at a time."""
+    if format == "csv":
+        reader = csv.DictReader(file)
+        missing = [column for column in ("Name", "Movie Title") if column not in (reader.fieldnames or [])]
+        if missing:
+            raise RowError(f"CSV header is missing {', '.join(missing)}")
+        for record in reader:
+            yield reader.line_num, record, None
+        return
+
+    for line_num, line in enumerate(file, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_num, None, f"invalid JSON: {str(e)}"
+            continue
+        if not isinstance(record, dict):
+            yield line_num, None, "expected a JSON object"
+            continue
+        yield line_num, record, None
+
+
+class MultipartFile:
+    """
+    Picks one file field out of a multipart/form-data body fed in chunks, so an
+    upload can be written out as it arrives instead of being spooled first.
+    The field's bytes collect as chunks are fed until drain() hands them over;
+    finish() returns the remainder once the body has ended.
+    """
+
+    def __init__(self, content_type, field="file"):
+        value, options = parse_options_header(content_type or "")
+        if value != b"multipart/form-data" or b"boundary" not in options:
+            raise UploadError("Expected a multipart/form-data upload")
+        self.field = field.encode()
+        self.found = False
+        self.filename = None
+        self.content_type = None
+        self._data = []
+        self._size = 0
+        self._in_field = False
+        self._headers = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._parser = multipart.MultipartParser(options[b"boundary"], {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    @property
+    def buffered(self):
+        return self._size
+
+    def feed(self, chunk):
+        self._parser.write(chunk)
+
+    def drain(self):
+        data = b"".join(self._data)
+        self._data, self._size = [], 0
+        return data
+
+    def finish(self):
+        self._parser.finalize()
+        if not self.found:
+            raise UploadError(f"Missing file field '{self.field.decode()}'")
+        return self.drain()
+
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_header_field(self, data, start, end):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data, start, end):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition"))
+        # Only the first file sent under the field name is imported
+        if self.found or options.get(b"name") != self.field or b"filename" not in options:
+            return
+        self.found = self._in_field = True
+        self.filename = options[b"filename"].decode("utf-8", "replace")
+        self.content_type = self._headers.get(b"content-type", b"").decode("latin-1") or None
+
+    def _on_part_data(self, data, start, end):
+        if self._in_field:
+            self._data.append(data[start:end])
+            self._size += end - start
+
+    def _on_part_end(self):
+        self._in_field = False
+
+
+class UploadStream(io.RawIOBase):
+    """
+    The uploaded file as a readable stream for the import thread, fed by the
+    request handler through a bounded queue. Once the reader closes it, for
+    instance after a failed job, whatever is still sent is dropped.
+    """
+
+    def __init__(self, max_chunks=UPLOAD_QUEUE_CHUNKS):
+        super().__init__()
+        self._queue = queue.Queue(max_chunks)
+        self._buffer = memoryview(b"")
+        self._eof = False
+        self._reader_done = threading.Event()
+
+    async def put(self, data):
+        if not data:
+            return
+        try:
+            self._queue.put_nowait(data)
+        except queue.Full:
+            await asyncio.to_thread(self._put, data)
+
+    async def end(self, error=None):
+        """Mark the end of the upload; `error` fails the read in progress."""
+        try:
+            self._queue.put_nowait(error)
+        except queue.Full:
+            await asyncio.to_thread(self._put, error)
+
+    def _put(self, item):
+        while not self._reader_done.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def readable(self):
+        return True
+
+    def readinto(self, target):
+        while not self._buffer:
+            if self._eof:
+                return 0
+            item = self._queue.get()
+            if item is None:
+                self._eof = True
+                return 0
+            if isinstance(item, BaseException):
+                self._eof = True
+                raise UploadError(f"Upload ended early: {str(item) or type(item).__name__}")
+            self._buffer = memoryview(item)
+        size = min(len(target), len(self._buffer))
+        target[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+    def close(self):
+        self._reader_done.set()
+        super().close()
+
+
+class ImportJob:
+    def __init__(self, filename, format):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.format = format
+        self.status = "queued"
+        self.rows_read = 0
+        self.rows_written = 0
+        self.errors = 0
+        self.error_samples = []
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.message = None
+
+    def record_error(self, line, message):
+        self.errors += 1
+        if len(self.error_samples) < MAX_ERROR_SAMPLES:
+            self.error_samples.append({"line": line, "error": message})
+
+    @property
+    def rows_per_sec(self):
+        if self.started_at is None:
+            return 0.0
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        return round(self.rows_written / elapsed, 1) if elapsed > 0 else 0.0
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "filename": self.filename,
+            "format": self.format,
+            "status": self.status,
+            "rows_read": self.rows_read,
+            "rows_written": self.rows_written,
+            "rows_per_sec": self.rows_per_sec,
+            "errors": self.errors,
+            "error_samples": self.error_samples,
+            "message": self.message,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class ImportManager:
+    """
+    Runs uploaded CSV/NDJSON files into Neo4j as background jobs.
+
+    The job starts as soon as the file's part of the request begins: its records
+    are parsed and written in UNWIND batches of `batch_size` while the rest of
+    the body is still arriving, with at most UPLOAD_QUEUE_CHUNKS chunks held in
+    between, so memory stays flat however large the file is and nothing is
+    spooled. If a batch fails, its rows are retried one by one so a single bad
+    row only costs itself. There is nowhere to keep a second upload while one
+    is being imported, so each worker takes one at a time and turns others away
+    with ImportBusyError. When a job finishes, the catalog statistics are
+    backfilled and a change event is published.
+    """
+
+    def __init__(self, change_feed=None, batch_size=1000, max_jobs=100):
+        self.change_feed = change_feed
+        self.batch_size = batch_size
+        self.max_jobs = max_jobs
+        self._jobs = OrderedDict()
+        self._tasks = set()
+        self._lock = asyncio.Lock()
+        self._stopping = threading.Event()
+
+    async def submit(self, graph, content_type, body, format=None):
+        """
+        Start a job for the `file` field of a multipart/form-data request body,
+        given as an async iterator of bytes, and feed it the file as the body
+        arrives. Returns once the body has been read; the job then finishes what
+        is still queued. The format is guessed from the file name unless
+        `format` is given. Raises ValueError for an unusable upload.
+        """
+        if format:
+            detect_format(None, requested=format)
+        upload = MultipartFile(content_type)
+        if self._lock.locked():
+            raise ImportBusyError("Another import is running on this worker, try again later")
+        await self._lock.acquire()
+        try:
+            # The file's headers arrive before any of its bytes
+            chunks = body.__aiter__()
+            while not upload.found:
+                try:
+                    upload.feed(await chunks.__anext__())
+                except StopAsyncIteration:
+                    upload.finish()
+            job = ImportJob(upload.filename, detect_format(upload.filename, upload.content_type, format))
+        except BaseException:
+            self._lock.release()
+            raise
+
+        self._jobs[job.id] = job
+        while len(self._jobs) > self.max_jobs:
+            self._jobs.popitem(last=False)
+        job.status = "running"
+        job.started_at = time.time()
+        logging.info(f"Import {job.id} started: {job.filename}")
+        stream = UploadStream()
+        task = asyncio.create_task(self._run(graph, job, stream))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+        try:
+            await stream.put(upload.drain())
+            async for chunk in chunks:
+                upload.feed(chunk)
+                await stream.put(upload.drain())
+            await stream.put(upload.finish())
+        except BaseException as e:
+            await stream.end(e)
+            raise
+        await stream.end()
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def list(self):
+        return [job.to_dict() for job in reversed(self._jobs.values())]
+
+    async def stop(self):
+        # Running jobs stop after their current batch
+        self._stopping.set()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _run(self, graph, job, stream):
+        # submit() took the lock for this job
+        try:
+            await asyncio.to_thread(self._import_stream, graph, job, stream)
+            if job.status == "running":
+                await asyncio.to_thread(stats.backfill, graph)
+                job.status = "completed"
+        except Exception as e:
+            job.status = "failed"
+            job.message = str(e)
+            logging.error(f"Import {job.id} failed: {str(e)}")
+        finally:
+            stream.close()
+            job.finished_at = time.time()
+            self._lock.release()
+
+        logging.info(f"Import {job.id} {job.status}: {job.rows_written} rows written, "
+                     f"{job.errors} errors, {job.rows_per_sec} rows/sec")
+        if job.rows_written and self.change_feed:
+            self.change_feed.publish("catalog", "imported", job.id, rows=job.rows_written)
+
+    def _import_stream(self, graph, job, stream):
+        batch = []
+        with io.TextIOWrapper(io.BufferedReader(stream), encoding="utf-8-sig", newline="") as file:
+            for line, record, error in read_records(file, job.format):
+                job.rows_read += 1
+                if error is None:
+                    try:
+                        batch.append((line, normalise(record)))
+                    except RowError as e:
+                        error = str(e)
+                if error is not None:
+                    job.record_error(line, error)
+                    continue
+                if len(batch) >= self.batch_size:
+                    self._write(graph, job, batch)
+                    batch = []
+                    if self._stopping.is_set():
+                        job.status = "cancelled"
+                        job.message = "Server shut down before the import finished"
+                        return
+        if batch:
+            self._write(graph, job, batch)
+
+    def _write(self, graph, job, batch):
+        try:
+            self._commit(graph, [row for _, row in batch])
+            job.rows_written += len(batch)
+            return
+        except Exception as e:
+            logging.warning(f"Import batch of {len(batch)} rows failed, retrying individually: {str(e)}")
+
+        for line, row in batch:
+            try:
+                self._commit(graph, [row])
+                job.rows_written += 1
+            except Exception as e:
+                job.record_error(line, str(e))
+
+    @staticmethod
+    def _commit(graph, rows):
+        tx = graph.begin()
+        try:
+            tx.run(registry.cypher("import.rows"), rows=rows)
+            graph.commit(tx)
+        except Exception:
+            graph.rollback(tx)
+            raise
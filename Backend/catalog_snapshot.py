@@ -0,0 +1,394 @@
+import os
+import sys
+import mmap
+import time
+import struct
+import logging
+from bisect import bisect_right
+from array import array
+from queries import registry
+
+# Read-only binary snapshot of the catalog, shared between worker processes to
+# serve autocomplete, filmography movie lists and casts without each worker
+# building its own name and ACTED_IN caches.
+#
+# Layout (little-endian, every section 8-byte aligned; readers cast the arrays
+# in place, so snapshots are only usable on little-endian hosts):
+#   header   magic, format version, snapshot version, graph version (the change
+#            feed version the export started at), actor/movie/edge counts
+#   sections (offset, length) table followed by the section bytes:
+#     actor names, lower-cased actor names, movie titles, lower-cased titles
+#       -> string tables: uint32 offsets[n + 1] + utf-8 blob, entries sorted,
+#          so an actor's or movie's id is its position in name order
+#     movie years    int32[movies], YEAR_NONE where unknown
+#     release dates  string table, empty where unknown
+#     actor -> movies, movie -> actors
+#       -> CSR adjacency: uint32 offsets[n + 1] + uint32 ids[edges]; an actor's
+#          movies are in filmography order, a movie's actors in name order
+#
+# Workers mmap the file and read it in place, so every process shares the same
+# page-cache copy and opening a snapshot costs no parsing.
+
+MAGIC = b"CATSNAP1"
+FORMAT_VERSION = 3
+HEADER = struct.Struct("<8sIQQIII")
+SECTIONS = [
+    "actor_name_offsets", "actor_names",
+    "actor_lower_offsets", "actor_lower",
+    "movie_title_offsets", "movie_titles",
+    "movie_lower_offsets", "movie_lower",
+    "movie_years",
+    "movie_release_offsets", "movie_releases",
+    "actor_movie_offsets", "actor_movies",
+    "movie_actor_offsets", "movie_actors",
+]
+# Array sections and the memoryview format they are cast to
+ARRAY_SECTIONS = {
+    "actor_name_offsets": "I", "actor_lower_offsets": "I",
+    "movie_title_offsets": "I", "movie_lower_offsets": "I",
+    "movie_years": "i", "movie_release_offsets": "I",
+    "actor_movie_offsets": "I", "actor_movies": "I",
+    "movie_actor_offsets": "I", "movie_actors": "I",
+}
+SECTION_ENTRY = struct.Struct("<QQ")
+CURRENT_FILE = "CURRENT"
+YEAR_NONE = -2 ** 31
+
+# Lower-cased tables separate entries with NUL so substring matches never
+# span two names
+SEPARATOR = b"\x00"
+
+# Change feed event types that can add, rename or remove a name or change a
+# movie's year; ACTED_IN changes only affect the adjacency
+CATALOG_EVENT_TYPES = ["actor", "movie", "catalog"]
+LINK_EVENT_TYPES = CATALOG_EVENT_TYPES + ["acted_in"]
+
+
+def _pack(values):
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values.tobytes()
+
+
+def _string_table(strings, separator=b""):
+    offsets = array("I", [0])
+    blob = bytearray()
+    for value in strings:
+        blob += value.encode("utf-8") + separator
+        offsets.append(len(blob))
+    return _pack(offsets), bytes(blob)
+
+
+def _csr(adjacency):
+    offsets = array("I", [0])
+    ids = array("I")
+    for neighbours in adjacency:
+        ids.extend(neighbours)
+        offsets.append(len(ids))
+    return _pack(offsets), _pack(ids)
+
+
+def build_snapshot(actor_names, movies, edges=(), graph_version=0):
+    """
+    Serialise the catalog as of change feed version `graph_version`. `movies`
+    are dicts with a title, year and release_date; `edges` are ACTED_IN
+    (actor name, movie title) pairs.
+    """
+    actor_names = sorted(set(actor_names))
+    movies = sorted({movie["title"]: movie for movie in movies}.values(), key=lambda movie: movie["title"])
+    movie_titles = [movie["title"] for movie in movies]
+    actor_ids = {name: i for i, name in enumerate(actor_names)}
+    movie_ids = {title: i for i, title in enumerate(movie_titles)}
+
+    actor_movies = [set() for _ in actor_names]
+    movie_actors = [set() for _ in movie_titles]
+    for name, title in edges:
+        if name in actor_ids and title in movie_ids:
+            actor_movies[actor_ids[name]].add(movie_ids[title])
+            movie_actors[movie_ids[title]].add(actor_ids[name])
+    # Newest first, undated last, then by title, as filmography lists them
+    for i, movie_set in enumerate(actor_movies):
+        actor_movies[i] = sorted(movie_set, key=lambda m: (-(movies[m].get("year") or 0), m))
+    movie_actors = [sorted(actor_set) for actor_set in movie_actors]
+
+    sections = {}
+    sections["actor_name_offsets"], sections["actor_names"] = _string_table(actor_names)
+    sections["actor_lower_offsets"], sections["actor_lower"] = _string_table(
+        [name.lower() for name in actor_names], SEPARATOR)
+    sections["movie_title_offsets"], sections["movie_titles"] = _string_table(movie_titles)
+    sections["movie_lower_offsets"], sections["movie_lower"] = _string_table(
+        [title.lower() for title in movie_titles], SEPARATOR)
+    sections["movie_years"] = _pack(array("i", [YEAR_NONE if movie.get("year") is None else movie["year"]
+                                                for movie in movies]))
+    sections["movie_release_offsets"], sections["movie_releases"] = _string_table(
+        [movie.get("release_date") or "" for movie in movies])
+    sections["actor_movie_offsets"], sections["actor_movies"] = _csr(actor_movies)
+    sections["movie_actor_offsets"], sections["movie_actors"] = _csr(movie_actors)
+    edge_count = sum(len(neighbours) for neighbours in actor_movies)
+
+    version = time.time_ns() // 1_000_000
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, version, graph_version,
+                         len(actor_names), len(movie_titles), edge_count)
+    position = _align(len(header) + SECTION_ENTRY.size * len(SECTIONS))
+    table = bytearray()
+    body = bytearray()
+    for name in SECTIONS:
+        data = sections[name]
+        table += SECTION_ENTRY.pack(position + len(body), len(data))
+        body += data
+        body += b"\x00" * (_align(len(body)) - len(body))
+
+    prefix = header + bytes(table)
+    return version, prefix + b"\x00" * (position - len(prefix)) + bytes(body)
+
+
+def _align(n):
+    return (n + 7) & ~7
+
+
+def export_snapshot(graph, directory, keep=3):
+    """Build a snapshot from Neo4j and publish it atomically in `directory`."""
+    # Read the version first: changes made during the export then make the
+    # snapshot look stale rather than current
+    graph_version = registry.run(graph, "changes.version").evaluate() or 0
+    actor_names = [record["name"] for record in registry.run(graph, "snapshot.actors") if record["name"]]
+    movies = [dict(record) for record in registry.run(graph, "snapshot.movies") if record["title"]]
+    edges = [(record["name"], record["title"]) for record in registry.run(graph, "snapshot.edges")]
+    version, data = build_snapshot(actor_names, movies, edges, graph_version)
+
+    os.makedirs(directory, exist_ok=True)
+    filename = f"catalog-{version}.snap"
+    _atomic_write(os.path.join(directory, filename), data)
+    _atomic_write(os.path.join(directory, CURRENT_FILE), filename.encode("utf-8"))
+    logging.info(f"Published catalog snapshot {filename} ({len(data)} bytes)")
+
+    # Old files stay readable by workers that still map them; unlinking only
+    # drops the directory entry
+    snapshots = sorted(f for f in os.listdir(directory) if f.startswith("catalog-") and f.endswith(".snap"))
+    for old in snapshots[:-keep]:
+        os.remove(os.path.join(directory, old))
+    return os.path.join(directory, filename)
+
+
+def _atomic_write(path, data):
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "wb") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+class CatalogSnapshot:
+    """A memory-mapped, read-only view of a snapshot file."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = memoryview(self._mmap)
+
+        (magic, format_version, self.version, self.graph_version,
+         self.actor_count, self.movie_count, self.edge_count) = HEADER.unpack_from(buffer)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            raise ValueError(f"Not a catalog snapshot: {path}")
+        if sys.byteorder != "little":
+            raise ValueError("Catalog snapshots can only be mapped on little-endian hosts")
+
+        self._bounds = {}
+        sections = {}
+        for i, name in enumerate(SECTIONS):
+            offset, length = SECTION_ENTRY.unpack_from(buffer, HEADER.size + i * SECTION_ENTRY.size)
+            self._bounds[name] = (offset, offset + length)
+            view = buffer[offset:offset + length]
+            if name in ARRAY_SECTIONS:
+                view = view.cast(ARRAY_SECTIONS[name])
+            sections[name] = view
+        self._sections = sections
+
+    def actor_name(self, i):
+        return self._string("actor_name_offsets", "actor_names", i)
+
+    def movie_title(self, i):
+        return self._string("movie_title_offsets", "movie_titles", i)
+
+    def movie(self, i):
+        year = self._sections["movie_years"][i]
+        return {
+            "title": self.movie_title(i),
+            "year": None if year == YEAR_NONE else year,
+            "release_date": self._string("movie_release_offsets", "movie_releases", i) or None,
+        }
+
+    def actor_id(self, name):
+        return self._find(self.actor_count, self.actor_name, name)
+
+    def movie_id(self, title):
+        return self._find(self.movie_count, self.movie_title, title)
+
+    def filmography(self, name, year_from=None, year_to=None, after_year=None, after_title=None, limit=None):
+        """The actor's movies like GraphRepository.filmography(), or None if the actor is missing."""
+        actor = self.actor_id(name)
+        if actor is None:
+            return None
+        offsets = self._sections["actor_movie_offsets"]
+        years = self._sections["movie_years"]
+        movies = []
+        for movie in self._sections["actor_movies"][offsets[actor]:offsets[actor + 1]]:
+            year = years[movie]
+            # A year filter excludes undated movies, as comparisons with null do in Cypher
+            if year_from is not None and (year == YEAR_NONE or year < year_from):
+                continue
+            if year_to is not None and (year == YEAR_NONE or year > year_to):
+                continue
+            if after_year is not None:
+                sort_year = 0 if year == YEAR_NONE else year
+                if sort_year > after_year or (sort_year == after_year and self.movie_title(movie) <= after_title):
+                    continue
+            movies.append(self.movie(movie))
+            if limit is not None and len(movies) == limit:
+                break
+        return movies
+
+    def cast(self, title):
+        """(movie, actor names in name order), or None if the movie is missing."""
+        movie = self.movie_id(title)
+        if movie is None:
+            return None
+        offsets = self._sections["movie_actor_offsets"]
+        actors = self._sections["movie_actors"][offsets[movie]:offsets[movie + 1]]
+        return self.movie(movie), [self.actor_name(actor) for actor in actors]
+
+    def autocomplete(self, search_type, query, limit=10):
+        """Case-insensitive substring search ranked like the autocomplete Cypher query."""
+        if search_type == "actor":
+            offsets_name, blob_name, value = "actor_lower_offsets", "actor_lower", self.actor_name
+        else:
+            offsets_name, blob_name, value = "movie_lower_offsets", "movie_lower", self.movie_title
+        offsets = self._sections[offsets_name]
+        start, end = self._bounds[blob_name]
+        needle = query.lower().encode("utf-8")
+        if not needle or SEPARATOR in needle:
+            return []
+
+        matches = []
+        position = self._mmap.find(needle, start, end)
+        while position != -1:
+            i = bisect_right(offsets, position - start) - 1
+            entry_start, entry_end = start + offsets[i], start + offsets[i + 1] - 1
+            if position == entry_start:
+                relevance = 0 if entry_end - entry_start == len(needle) else 1
+            else:
+                relevance = 2
+            # Entries are stored sorted, so index order is name order
+            matches.append((relevance, i))
+            position = self._mmap.find(needle, entry_end + 1, end)
+
+        matches.sort()
+        return [value(i) for _, i in matches[:limit]]
+
+    def _string(self, offsets_name, blob_name, i):
+        offsets = self._sections[offsets_name]
+        return bytes(self._sections[blob_name][offsets[i]:offsets[i + 1]]).decode("utf-8")
+
+    @staticmethod
+    def _find(count, value, key):
+        # Binary search over a sorted string table
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            if value(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low if low < count and value(low) == key else None
+
+
+
+class SnapshotStore:
+    """
+    Tracks the published snapshot in a directory and swaps to new versions.
+
+    `current` is replaced with a single reference assignment, so readers always
+    see either the old or the new snapshot. Superseded mappings are released
+    once no request holds a reference to them.
+
+    A snapshot goes stale once an actor or movie changes after its graph
+    version, and its adjacency also once an ACTED_IN relationship does. Both
+    are checked against the ChangeEvent log when it is loaded and then kept up
+    to date by on_change(), a change feed listener. usable() only returns a
+    current snapshot; until the next export, reads go to the database.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.current = None
+        self.stale = False
+        self.links_stale = False
+        self._published = None
+        self._checked = False
+
+    def usable(self, links=False):
+        """The current snapshot if it is up to date, for names only or with `links` too."""
+        snapshot = self.current
+        if snapshot is None or self.stale or (links and self.links_stale):
+            return None
+        return snapshot
+
+    def refresh(self, graph=None):
+        try:
+            with open(os.path.join(self.directory, CURRENT_FILE), "rb") as file:
+                published = file.read().decode("utf-8").strip()
+        except FileNotFoundError:
+            published = self._published
+        if published != self._published:
+            try:
+                self.current = CatalogSnapshot(os.path.join(self.directory, published))
+                self._published = published
+                self.stale = self.links_stale = False
+                self._checked = False
+                logging.info(f"Loaded catalog snapshot {published}: {self.current.actor_count} actors, "
+                             f"{self.current.movie_count} movies")
+            except Exception as e:
+                logging.error(f"Could not load catalog snapshot {published}: {str(e)}")
+
+        # Without a database there is nothing to check against
+        if self.current is not None and graph is not None and not self._checked:
+            since = self.current.graph_version
+            if registry.run(graph, "snapshot.stale", since=since, types=LINK_EVENT_TYPES).evaluate():
+                if registry.run(graph, "snapshot.stale", since=since, types=CATALOG_EVENT_TYPES).evaluate():
+                    self._mark_stale()
+                else:
+                    self._mark_links_stale()
+            self._checked = True
+        return self.current
+
+    def on_change(self, event):
+        snapshot = self.current
+        if snapshot is None or event["version"] <= snapshot.graph_version:
+            return
+        if event["type"] in CATALOG_EVENT_TYPES and not self.stale:
+            self._mark_stale()
+        elif event["type"] in LINK_EVENT_TYPES and not self.links_stale:
+            self._mark_links_stale()
+
+    def _mark_stale(self):
+        self.stale = self.links_stale = True
+        logging.info(f"Catalog snapshot {self._published} is out of date, reading from Neo4j until the next export")
+
+    def _mark_links_stale(self):
+        self.links_stale = True
+        logging.info(f"Catalog snapshot {self._published} has out of date ACTED_IN links, reading filmographies "
+                     f"and casts from Neo4j until the next export")
+
+
+if __name__ == "__main__":
+    # Exporter job: python catalog_snapshot.py <directory>
+    from py2neo import Graph
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    db = Graph(os.getenv("NEO4J_URI", "bolt://localhost:7687"),
+               auth=(os.getenv("NEO4J_USER", "neo4j"), os.getenv("NEO4J_PASSWORD", "password")),
+               name="neo4j")
+    registry.probe(db)
+    export_snapshot(db, sys.argv[1] if len(sys.argv) > 1 else os.getenv("CATALOG_SNAPSHOT_DIR", "snapshots"))
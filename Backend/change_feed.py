@@ -0,0 +1,205 @@
+import asyncio
+import json
+import logging
+import threading
+from collections import deque
+from queries import registry
+
+# Events fetched per poll of the ChangeEvent log
+FETCH_LIMIT = 500
+
+
+class ChangeFeed:
+    """
+    Feed of graph mutations with a monotonically increasing graph version.
+
+    Handlers call publish() which only queues the event. A single task per worker
+    writes queued events to Neo4j in one batch (assigning versions from the shared
+    GraphVersion counter), then tails the ChangeEvent log so events published by
+    other workers reach this worker's subscribers too. Events are best-effort
+    cache-invalidation hints; if a client falls behind the retained history it
+    receives a `reset` event and should drop its caches. In-process caches can
+    register a callable in `listeners` to see every event as it is delivered.
+    """
+
+    def __init__(self, poll_interval=1.0, buffer_size=1000, retention=10000, subscriber_queue_size=1000):
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.subscriber_queue_size = subscriber_queue_size
+        self.graph = None
+        self.version = None
+        self.recent = deque(maxlen=buffer_size)
+        self._pending = []
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self.listeners = []
+        self._loop = None
+        self._wake = None
+        # Set once the current graph version has been read at startup
+        self._ready = asyncio.Event()
+
+    def publish(self, type, op, key, **data):
+        """Queue a change event; safe to call from any thread."""
+        event = {"type": type, "op": op, "key": key}
+        if data:
+            event["data"] = data
+        with self._lock:
+            self._pending.append(event)
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def run(self, graph):
+        self.graph = graph
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self.version = await asyncio.to_thread(self._current_version)
+        self._ready.set()
+
+        polls = 0
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await asyncio.to_thread(self._flush_pending)
+                events = await asyncio.to_thread(self._fetch_since, self.version)
+                self._deliver(events)
+                if len(events) == FETCH_LIMIT:
+                    # More history is waiting; poll again straight away
+                    self._wake.set()
+                polls += 1
+                if polls % 60 == 0:
+                    await asyncio.to_thread(self._prune)
+            except Exception as e:
+                logging.error(f"Change feed poll failed: {str(e)}")
+
+    async def close(self):
+        """Write out events still queued; call after the last publisher has stopped."""
+        if self.graph is None:
+            return
+        try:
+            await asyncio.to_thread(self._flush_pending)
+        except Exception as e:
+            logging.error(f"Change feed lost {len(self._pending)} events on shutdown: {str(e)}")
+
+    async def stream(self, since, request, heartbeat=15.0):
+        """Yield server-sent events after `since`, then live events."""
+        queue = asyncio.Queue(maxsize=self.subscriber_queue_size)
+        self._subscribers.add(queue)
+        try:
+            yield "retry: 3000\n\n"
+            # Until the version is known, any `since` would look like a lost history
+            while not self._ready.is_set():
+                if await request.is_disconnected():
+                    return
+                try:
+                    await asyncio.wait_for(self._ready.wait(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+            last = self.version
+            if since is None:
+                yield self._format("version", {"version": last}, last)
+            elif since > last:
+                # The client saw a history this graph no longer has
+                yield self._format("reset", {"version": last}, last)
+            else:
+                # Replay missed events before switching to live delivery
+                backlog = await self._backlog(since)
+                if backlog is None:
+                    yield self._format("reset", {"version": last}, last)
+                else:
+                    for event in backlog:
+                        yield self._format("change", event, event["version"])
+                        last = event["version"]
+
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is None:
+                    # The subscriber overflowed; tell the client to resynchronise
+                    yield self._format("reset", {"version": self.version}, self.version)
+                    return
+                if event["version"] <= last:
+                    continue
+                last = event["version"]
+                yield self._format("change", event, last)
+        finally:
+            self._subscribers.discard(queue)
+
+    async def _backlog(self, since):
+        if self.recent and self.recent[0]["version"] <= since + 1:
+            return [event for event in self.recent if event["version"] > since]
+        events = []
+        while True:
+            batch = await asyncio.to_thread(self._fetch_since, since)
+            if not batch:
+                break
+            if not events and batch[0]["version"] > since + 1:
+                # Part of the requested history has been pruned
+                return None
+            events.extend(batch)
+            since = batch[-1]["version"]
+        return events
+
+    def _deliver(self, events):
+        for event in events:
+            self.version = event["version"]
+            self.recent.append(event)
+            for listener in self.listeners:
+                try:
+                    listener(event)
+                except Exception as e:
+                    logging.error(f"Change feed listener failed: {str(e)}")
+            for queue in list(self._subscribers):
+                try:
+                    queue.put_nowait(event)
+                except asyncio.QueueFull:
+                    self._subscribers.discard(queue)
+                    self._drop(queue)
+
+    @staticmethod
+    def _drop(queue):
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+    def _flush_pending(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+        try:
+            registry.run(self.graph, "changes.publish", events=[
+                {**event, "data": json.dumps(event.get("data"))} for event in pending])
+        except Exception:
+            with self._lock:
+                self._pending = pending + self._pending
+            raise
+
+    def _fetch_since(self, since):
+        rows = registry.run(self.graph, "changes.since", since=since or 0, limit=FETCH_LIMIT).data()
+        events = []
+        for row in rows:
+            event = {"version": row["version"], "type": row["type"], "op": row["op"], "key": row["key"],
+                     "ts": row["ts"]}
+            data = json.loads(row["data"]) if row["data"] else None
+            if data:
+                event["data"] = data
+            events.append(event)
+        return events
+
+    def _current_version(self):
+        return registry.run(self.graph, "changes.version").evaluate() or 0
+
+    def _prune(self):
+        if self.version and self.version > self.retention:
+            registry.run(self.graph, "changes.prune", cutoff=self.version - self.retention)
+
+    @staticmethod
+    def _format(event_type, payload, event_id):
+        return f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(payload, default=str)}\n\n"
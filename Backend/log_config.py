@@ -0,0 +1,135 @@
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+# Per-request context attached to every log record emitted while handling it
+request_id_var = contextvars.ContextVar("request_id", default=None)
+route_var = contextvars.ContextVar("route", default=None)
+query_ids_var = contextvars.ContextVar("query_ids", default=None)
+
+access_logger = logging.getLogger("api.access")
+
+# What setup_logging() installed, so shutdown_logging() can take it out again
+_listener = None
+_installed = None
+
+
+def record_query(query_id):
+    """Remember that the current request ran the named query."""
+    query_ids = query_ids_var.get()
+    if query_ids is not None:
+        query_ids.append(query_id)
+
+
+class ContextFilter(logging.Filter):
+    """Copies the request context onto the record before it leaves the request task."""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        record.route = route_var.get()
+        query_ids = query_ids_var.get()
+        record.query_ids = list(query_ids) if query_ids else None
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    FIELDS = ("request_id", "route", "method", "status_code", "duration_ms", "query_ids")
+
+    def format(self, record):
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in self.FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SuccessSampler(logging.Filter):
+    """
+    Rate-limits INFO-level success logs. Warnings and errors always pass.
+
+    Each record is kept with probability `sample_rate`, and at most
+    `max_per_second` sampled records are let through per second.
+    """
+
+    def __init__(self, sample_rate=1.0, max_per_second=0):
+        super().__init__()
+        self.sample_rate = sample_rate
+        self.max_per_second = max_per_second
+        self._lock = threading.Lock()
+        self._window = 0
+        self._count = 0
+
+    def filter(self, record):
+        if record.levelno > logging.INFO:
+            return True
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return False
+        if self.max_per_second:
+            now = int(time.monotonic())
+            with self._lock:
+                if now != self._window:
+                    self._window = now
+                    self._count = 0
+                if self._count >= self.max_per_second:
+                    return False
+                self._count += 1
+        return True
+
+
+def setup_logging(log_file, level=logging.INFO, sample_rate=1.0, max_per_second=0):
+    """
+    Route all logging through an in-memory queue so handlers never block on disk.
+
+    Records are formatted as JSON lines and written by a background listener thread.
+    Calling it again after shutdown_logging() starts afresh.
+    """
+    global _listener, _installed
+    if _listener is not None:
+        return _listener
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(queue_handler)
+
+    sampler = SuccessSampler(sample_rate, max_per_second)
+    access_logger.addFilter(sampler)
+
+    file_handler = logging.FileHandler(log_file, encoding="utf-8")
+    file_handler.setFormatter(JSONFormatter())
+
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+    _listener.start()
+    _installed = (queue_handler, sampler, file_handler)
+    return _listener
+
+
+def shutdown_logging():
+    """Write out queued records and detach everything setup_logging() installed."""
+    global _listener, _installed
+    if _listener is None:
+        return
+    queue_handler, sampler, file_handler = _installed
+    # Detach first, so nothing is queued after the listener has drained
+    logging.getLogger().removeHandler(queue_handler)
+    access_logger.removeFilter(sampler)
+    _listener.stop()
+    file_handler.close()
+    _listener = _installed = None
@@ -1,26 +1,33 @@
 import os
-from fastapi import FastAPI, HTTPException, Query
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, HTTPException, Query, Request, Depends, Response, Header
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from py2neo import Graph, Node, Relationship, NodeMatcher
+from py2neo import Graph
 from typing import Optional, List
 import logging
-import requests
 import re
+import json
+import base64
 from datetime import datetime
 import asyncio
+import time
+import uuid
+import random
+from contextlib import asynccontextmanager
 from pathlib import Path
-
-app = FastAPI()
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Allows all origins
-    allow_credentials=True,
-    allow_methods=["*"],  # Allows all methods
-    allow_headers=["*"],  # Allows all headers
-)
+from write_batcher import WriteBatcher, QueueFullError
+import stats
+from migrations import run_migrations
+from catalog_snapshot import SnapshotStore
+from change_feed import ChangeFeed
+from bulk_import import ImportBusyError, ImportManager, detect_format
+from repository import Neo4jRepository, InMemoryRepository, ReadThroughRepository
+from tmdb_client import TMDBClient, CircuitBreaker, TMDBUnavailableError
+from queries import registry
+from profiling import Profile, ProfileStore, ProfiledRoute
+from log_config import (setup_logging, shutdown_logging, access_logger,
+                        request_id_var, route_var, query_ids_var)
 
 # Neo4j connection setup
 NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
@@ -30,17 +37,319 @@ NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "password")
 # TMDB API setup
 TMDB_API_KEY = os.getenv("TMDB_API_KEY", "535b98608031a939cdef34fb2a98ebc5")
 TMDB_BASE_URL = os.getenv("TMDB_BASE_URL", "https://api.themoviedb.org/3")
+TMDB_CONNECT_TIMEOUT = float(os.getenv("TMDB_CONNECT_TIMEOUT", 3))
+TMDB_READ_TIMEOUT = float(os.getenv("TMDB_READ_TIMEOUT", 10))
+TMDB_MAX_CONNECTIONS = int(os.getenv("TMDB_MAX_CONNECTIONS", 20))
+TMDB_MAX_CONCURRENCY = int(os.getenv("TMDB_MAX_CONCURRENCY", 10))
+TMDB_RETRIES = int(os.getenv("TMDB_RETRIES", 3))
+TMDB_BREAKER_THRESHOLD = int(os.getenv("TMDB_BREAKER_THRESHOLD", 5))
+TMDB_BREAKER_RESET = float(os.getenv("TMDB_BREAKER_RESET", 30))
 
 PORT = os.getenv("PORT",10000)
 
-# Connect to Neo4j
-graph = Graph(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD),name="neo4j")
-matcher = NodeMatcher(graph)
+# Storage backend: "neo4j", or "memory" to run without a database
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "neo4j").lower()
+if STORAGE_BACKEND not in ("neo4j", "memory"):
+    raise ValueError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND}")
+MEMORY_SEED_FILE = os.getenv("MEMORY_SEED_FILE")
+READ_CACHE = os.getenv("READ_CACHE", "false").lower() in ("1", "true", "yes")
+READ_CACHE_MAX_NODES = int(os.getenv("READ_CACHE_MAX_NODES", 100000))
+
+# Optional write batching for high-volume create endpoints
+WRITE_BATCHING = os.getenv("WRITE_BATCHING", "false").lower() in ("1", "true", "yes")
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", 100))
+WRITE_BATCH_WINDOW_MS = float(os.getenv("WRITE_BATCH_WINDOW_MS", 20))
+WRITE_QUEUE_MAXSIZE = int(os.getenv("WRITE_QUEUE_MAXSIZE", 1000))
+
+# Logging setup
+LOG_FILE = os.getenv("LOG_FILE", str(Path(__file__).parent / "api_log.jsonl"))
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_SUCCESS_SAMPLE_RATE = float(os.getenv("LOG_SUCCESS_SAMPLE_RATE", 1.0))
+LOG_SUCCESS_MAX_PER_SEC = int(os.getenv("LOG_SUCCESS_MAX_PER_SEC", 0))
+
+# Shared catalog snapshot (see catalog_snapshot.py); disabled when unset
+CATALOG_SNAPSHOT_DIR = os.getenv("CATALOG_SNAPSHOT_DIR")
+CATALOG_SNAPSHOT_POLL_INTERVAL = float(os.getenv("CATALOG_SNAPSHOT_POLL_INTERVAL", 5))
+
+# Change feed of graph mutations, streamed to clients over SSE
+CHANGE_FEED_POLL_INTERVAL = float(os.getenv("CHANGE_FEED_POLL_INTERVAL", 1))
+CHANGE_FEED_RETENTION = int(os.getenv("CHANGE_FEED_RETENTION", 10000))
+
+# Bulk CSV/NDJSON imports via POST /import
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 1000))
+IMPORT_HISTORY = int(os.getenv("IMPORT_HISTORY", 100))
+
+# Opt-in request profiling; disabled unless a token or sample rate is set
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+PROFILE_HISTORY = int(os.getenv("PROFILE_HISTORY", 100))
+if PROFILE_SAMPLE_RATE > 0 and not PROFILE_TOKEN:
+    # The admin endpoints are guarded by the token, so sampled profiles would be unreadable
+    raise ValueError("PROFILE_SAMPLE_RATE needs PROFILE_TOKEN to be set")
+
+# Startup / readiness
+NEO4J_CONNECT_MAX_BACKOFF = float(os.getenv("NEO4J_CONNECT_MAX_BACKOFF", 30))
+READINESS_INTERVAL = float(os.getenv("READINESS_INTERVAL", 10))
+READINESS_TIMEOUT = float(os.getenv("READINESS_TIMEOUT", 3))
+
+# Neo4j handles are created by the lifespan task, not at import time,
+# so workers boot without waiting on the database. Handlers go through `repo`;
+# `graph` is only set with the Neo4j backend.
+graph = None
+repo = None
+write_batcher = None
+
+# Shared TMDB client; opened and closed by the lifespan
+tmdb = TMDBClient(TMDB_BASE_URL, TMDB_API_KEY,
+                  connect_timeout=TMDB_CONNECT_TIMEOUT,
+                  read_timeout=TMDB_READ_TIMEOUT,
+                  max_connections=TMDB_MAX_CONNECTIONS,
+                  max_concurrency=TMDB_MAX_CONCURRENCY,
+                  retries=TMDB_RETRIES,
+                  breaker=CircuitBreaker(TMDB_BREAKER_THRESHOLD, TMDB_BREAKER_RESET))
+
+# Snapshots are exported from Neo4j and checked against its change feed
+snapshots = SnapshotStore(CATALOG_SNAPSHOT_DIR) if CATALOG_SNAPSHOT_DIR and STORAGE_BACKEND == "neo4j" else None
+
+change_feed = ChangeFeed(poll_interval=CHANGE_FEED_POLL_INTERVAL, retention=CHANGE_FEED_RETENTION)
+if snapshots:
+    change_feed.listeners.append(snapshots.on_change)
+
+importer = ImportManager(change_feed, batch_size=IMPORT_BATCH_SIZE, max_jobs=IMPORT_HISTORY)
+
+# Recent request profiles, kept per worker
+profiles = ProfileStore(PROFILE_HISTORY)
+
+# Cached readiness, refreshed in the background so probes never hit Neo4j
+readiness = {
+    "neo4j": "down",
+    "warmed_up": False,
+    "checked_at": None,
+    "error": None,
+}
+
+# Routes that must answer before the database is reachable
+DATABASE_FREE_PATHS = {"/", "/livez", "/readyz", "/health", "/docs", "/redoc", "/openapi.json"}
+
+# Indexes created during warm-up
+STARTUP_INDEXES = [
+    "CREATE INDEX actor_name IF NOT EXISTS FOR (a:Actor) ON (a.name)",
+    "CREATE INDEX movie_title IF NOT EXISTS FOR (m:Movie) ON (m.title)",
+    "CREATE INDEX movie_year_title IF NOT EXISTS FOR (m:Movie) ON (m.year, m.title)",
+    # Superseded by the change_event_version_unique constraint below
+    "DROP INDEX change_event_version IF EXISTS",
+] + stats.STATS_INDEXES
+
+# Uniqueness constraints, created after migrations have removed duplicates.
+# Counter nodes are MERGEd concurrently, which is only safe under a constraint.
+STARTUP_CONSTRAINTS = [
+    "CREATE CONSTRAINT graph_version_id_unique IF NOT EXISTS FOR (c:GraphVersion) REQUIRE c.id IS UNIQUE",
+    "CREATE CONSTRAINT change_event_version_unique IF NOT EXISTS FOR (e:ChangeEvent) REQUIRE e.version IS UNIQUE",
+] + stats.STATS_CONSTRAINTS
+
+def ping_neo4j(db):
+    return db.run(registry.cypher("health.ping")).evaluate() == 1
+
+def neo4j_repository(db):
+    if not READ_CACHE:
+        return Neo4jRepository(db)
+    cached = ReadThroughRepository(Neo4jRepository(db), max_nodes=READ_CACHE_MAX_NODES)
+    # Other workers' writes reach the cache through the change feed
+    change_feed.listeners.append(cached.invalidate)
+    return cached
+
+async def connect_neo4j():
+    global graph, repo
+    delay = 0.5
+    attempt = 1
+    while True:
+        try:
+            db = await asyncio.to_thread(Graph, NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD), name="neo4j")
+            await asyncio.to_thread(ping_neo4j, db)
+            # Pick query variants for this server before any request can run
+            await asyncio.to_thread(registry.probe, db)
+            graph = db
+            repo = neo4j_repository(db)
+            readiness.update(neo4j="up", checked_at=datetime.utcnow().isoformat(), error=None)
+            logging.info(f"Connected to Neo4j at {NEO4J_URI} after {attempt} attempt(s)")
+            return
+        except Exception as e:
+            readiness.update(neo4j="down", checked_at=datetime.utcnow().isoformat(), error=str(e))
+            logging.warning(f"Neo4j connection attempt {attempt} failed, retrying in {delay:.1f}s: {str(e)}")
+            # Exponential backoff with jitter
+            await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+            delay = min(delay * 2, NEO4J_CONNECT_MAX_BACKOFF)
+            attempt += 1
+
+def run_schema(statements):
+    # One failing index or constraint should not keep the others, or the warm-up, from running
+    for statement in statements:
+        try:
+            graph.run(statement)
+        except Exception as e:
+            logging.error(f"Schema statement failed: {statement}: {str(e)}")
+
+def warm_up():
+    run_schema(STARTUP_INDEXES)
+    try:
+        run_migrations(graph)
+    except Exception as e:
+        logging.error(f"Migrations failed, retried on the next start: {str(e)}")
+    run_schema(STARTUP_CONSTRAINTS)
+    # Re-probe so newly created indexes are visible, then prime the plan cache
+    registry.probe(graph)
+    registry.warm(graph)
+
+async def start_backend():
+    global write_batcher
+    await connect_neo4j()
+    background_tasks.append(asyncio.create_task(change_feed.run(graph)))
+
+    if WRITE_BATCHING:
+        write_batcher = WriteBatcher(graph,
+                                     batch_size=WRITE_BATCH_SIZE,
+                                     window=WRITE_BATCH_WINDOW_MS / 1000,
+                                     max_queue=WRITE_QUEUE_MAXSIZE)
+        await write_batcher.start()
+
+    try:
+        await asyncio.to_thread(warm_up)
+        readiness["warmed_up"] = True
+        logging.info("Warm-up complete")
+    except Exception as e:
+        logging.error(f"Warm-up failed: {str(e)}")
+
+async def refresh_readiness():
+    while True:
+        await asyncio.sleep(READINESS_INTERVAL)
+        if graph is None:
+            continue
+        try:
+            ok = await asyncio.wait_for(asyncio.to_thread(ping_neo4j, graph), READINESS_TIMEOUT)
+            readiness.update(neo4j="up" if ok else "down", error=None)
+        except Exception as e:
+            readiness.update(neo4j="down", error=str(e) or type(e).__name__)
+        readiness["checked_at"] = datetime.utcnow().isoformat()
+
+async def watch_snapshots():
+    while True:
+        try:
+            await asyncio.to_thread(snapshots.refresh, graph)
+        except Exception as e:
+            logging.error(f"Catalog snapshot refresh failed: {str(e)}")
+        await asyncio.sleep(CATALOG_SNAPSHOT_POLL_INTERVAL)
+
+# Long-running tasks cancelled on shutdown
+background_tasks = []
+
+def load_memory_repository():
+    memory = InMemoryRepository()
+    if MEMORY_SEED_FILE:
+        loaded, skipped = memory.load(MEMORY_SEED_FILE, detect_format(MEMORY_SEED_FILE))
+        logging.info(f"Loaded {loaded} rows from {MEMORY_SEED_FILE} into the in-memory graph ({skipped} skipped)")
+    return memory
+
+@asynccontextmanager
+async def lifespan(app):
+    global repo
+    # JSON lines, written off the request path by a background thread. Set up
+    # per lifespan, so an app restarted in the same process logs again
+    setup_logging(LOG_FILE,
+                  level=LOG_LEVEL,
+                  sample_rate=LOG_SUCCESS_SAMPLE_RATE,
+                  max_per_second=LOG_SUCCESS_MAX_PER_SEC)
+    await tmdb.start()
+    if STORAGE_BACKEND == "memory":
+        repo = await asyncio.to_thread(load_memory_repository)
+    else:
+        background_tasks.append(asyncio.create_task(start_backend()))
+        background_tasks.append(asyncio.create_task(refresh_readiness()))
+    if snapshots:
+        background_tasks.append(asyncio.create_task(watch_snapshots()))
+    yield
+    # Stop everything that publishes change events before the feed's last flush
+    await importer.stop()
+    if write_batcher:
+        await write_batcher.stop()
+    await change_feed.close()
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await tmdb.close()
+    shutdown_logging()
+
+async def require_database(request: Request):
+    if repo is None and request.url.path not in DATABASE_FREE_PATHS:
+        # Autocomplete can be answered from the catalog snapshot alone
+        if request.url.path.startswith("/autocomplete/") and snapshots and snapshots.usable():
+            return
+        if request.url.path.startswith("/admin/profiles"):
+            return
+        raise HTTPException(status_code=503, detail="Database connection not ready")
+
+async def require_neo4j():
+    # Change feed, statistics and bulk import are built on Neo4j
+    if STORAGE_BACKEND != "neo4j":
+        raise HTTPException(status_code=501, detail="Not available with the in-memory storage backend")
+
+app = FastAPI(lifespan=lifespan, dependencies=[Depends(require_database)])
+app.router.route_class = ProfiledRoute
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],  # Allows all origins
+    allow_credentials=True,
+    allow_methods=["*"],  # Allows all methods
+    allow_headers=["*"],  # Allows all headers
+    expose_headers=["X-Next-Cursor"],  # Keyset pagination cursor
+)
+
+def should_profile(request: Request):
+    if PROFILE_TOKEN and request.headers.get("X-Profile") == PROFILE_TOKEN:
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+# Profiling shares this middleware rather than adding its own, which would cost
+# every request an extra BaseHTTPMiddleware hop even when nothing is sampled
+@app.middleware("http")
+async def log_requests(request: Request, call_next):
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    request_id_var.set(request_id)
+    route_var.set(request.url.path)
+    query_ids_var.set([])
+    profile = Profile(request.method, request.url.path, request_id) if should_profile(request) else None
+    start = time.perf_counter()
 
+    status_code = 500
+    try:
+        if profile is None:
+            response = await call_next(request)
+        else:
+            with profile:
+                response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        # Prefer the route template over the raw path so logs group by endpoint
+        route = request.scope.get("route")
+        if route is not None:
+            route_var.set(route.path)
+        level = logging.INFO if status_code < 400 else logging.WARNING
+        access_logger.log(level, f"{request.method} {request.url.path} {status_code}",
+                          extra={"method": request.method,
+                                 "status_code": status_code,
+                                 "duration_ms": round((time.perf_counter() - start) * 1000, 2)})
+    response.headers["X-Request-ID"] = request_id
+    if profile is not None:
+        profile.route = route.path if route is not None else None
+        profile.status_code = status_code
+        profiles.add(profile)
+        response.headers["X-Profile-Id"] = profile.id
+    return response
 
-# Set up logging
-logging.basicConfig(filename='api_log.txt', level=logging.INFO, 
-                    format='%(asctime)s - %(levelname)s - %(message)s')
+def publish_change(type, op, key, **data):
+    # Nothing consumes the feed without Neo4j
+    if STORAGE_BACKEND == "neo4j":
+        change_feed.publish(type, op, key, **data)
 
 # Load HTML content
 # Update the HTML content loading to use a function
@@ -55,41 +364,20 @@ def get_html_content():
     except Exception as e:
         logging.error(f"Error reading index.html: {str(e)}")
         return f"Error reading index.html: {str(e)}"
-
-logging.basicConfig(
-    filename=Path(__file__).parent.parent / 'api_log.txt',
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
-    
+ 
 @app.get("/autocomplete/{search_type}")
 async def autocomplete(search_type: str, query: str = Query(..., min_length=1)):
     if search_type not in ['actor', 'movie']:
         raise HTTPException(status_code=400, detail="Invalid search type")
     
-    # Define label based on search type
-    label = 'Actor' if search_type == 'actor' else 'Movie'
-    property_name = 'name' if search_type == 'actor' else 'title'
-    
-    # Modified Cypher query to handle both exact and partial matches
-    cypher_query = f"""
-    MATCH (n:{label})
-    WHERE toLower(n.{property_name}) CONTAINS toLower($query)
-    WITH n, 
-         CASE WHEN toLower(n.{property_name}) = toLower($query) THEN 0
-              WHEN toLower(n.{property_name}) STARTS WITH toLower($query) THEN 1
-              ELSE 2 END as relevance
-    ORDER BY relevance, n.{property_name}
-    RETURN n.{property_name} AS name, relevance
-    LIMIT 10
-    """
-    
+    # Serve from the shared catalog snapshot while it is up to date
+    snapshot = snapshots.usable() if snapshots else None
+    if snapshot is not None:
+        return snapshot.autocomplete(search_type, query)
+
     try:
-        results = graph.run(cypher_query, query=query).data()
-        
-        # Format results
-        suggestions = [result['name'] for result in results]
-        return suggestions
+        # Exact and partial matches, ranked by relevance
+        return repo.autocomplete(search_type, query)
         
     except Exception as e:
         logging.error(f"Error in autocomplete: {str(e)}")
@@ -100,24 +388,8 @@ async def search(search_type: str, query: str = Query(..., min_length=1)):
     if search_type not in ['actor', 'movie']:
         raise HTTPException(status_code=400, detail="Invalid search type")
     
-    label = 'Actor' if search_type == 'actor' else 'Movie'
-    property_name = 'name' if search_type == 'actor' else 'title'
-    
-    cypher_query = f"""
-    MATCH (n:{label})
-    WHERE toLower(n.{property_name}) CONTAINS toLower($query)
-    WITH n,
-         CASE WHEN toLower(n.{property_name}) = toLower($query) THEN 0
-              WHEN toLower(n.{property_name}) STARTS WITH toLower($query) THEN 1
-              ELSE 2 END as relevance
-    ORDER BY relevance, n.{property_name}
-    RETURN n
-    LIMIT 20
-    """
-    
     try:
-        results = graph.run(cypher_query, query=query).data()
-        return [dict(result['n']) for result in results]
+        return repo.search(search_type, query)
     except Exception as e:
         logging.error(f"Error in search: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -131,7 +403,8 @@ class Actor(BaseModel):
 
 class Movie(BaseModel):
     title: str
-    year: str
+    year: Optional[int] = None
+    release_date: Optional[str] = None
 
 class ActorInMovie(BaseModel):
     actor_name: str
@@ -140,6 +413,27 @@ class ActorInMovie(BaseModel):
 class ActorFilmography(BaseModel):
     actor: Actor
     movies: List[Movie]
+    next_cursor: Optional[str] = None
+
+# Keyset pagination cursors are opaque: base64url of the JSON [year, title] of
+# the last item on a page, so any title survives an ASCII-only HTTP header
+YEAR_MIN = 0
+YEAR_MAX = 9999
+DEFAULT_PAGE_SIZE = 100
+
+def encode_cursor(year, title):
+    payload = json.dumps([year, title], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor):
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        year, title = json.loads(payload)
+        if not isinstance(year, int) or not isinstance(title, str):
+            raise ValueError(cursor)
+        return year, title
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 class ActorCreate(BaseModel):
     name: str
@@ -149,31 +443,37 @@ class ActorCreate(BaseModel):
 @app.post("/actors", response_model=Actor)
 async def create_actor(actor: Actor):
     try:
-        actor_node = Node("Actor", **actor.dict())
-        graph.create(actor_node)
+        if write_batcher:
+            await write_batcher.submit("actor", actor.dict())
+            # The batcher writes to Neo4j directly, past the read cache
+            repo.invalidate({"type": "actor", "key": actor.name})
+        else:
+            repo.create_actor(actor.dict())
+        publish_change("actor", "created", actor.name)
         logging.info(f"Actor created: {actor.name}")
         return actor
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logging.error(f"Error creating actor: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/actors/{name}", response_model=Actor)
 async def read_actor(name: str):
-    actor_node = matcher.match("Actor", name=name).first()
-    if actor_node:
-        return Actor(**dict(actor_node))
+    actor = repo.get_actor(name)
+    if actor:
+        return Actor(**actor)
     raise HTTPException(status_code=404, detail="Actor not found")
 
 @app.get("/actors", response_model=List[Actor])
 async def read_actors():
-    actors = matcher.match("Actor")
-    return [Actor(**dict(actor)) for actor in actors]
+    return [Actor(**actor) for actor in repo.list_actors()]
 
 @app.delete("/actors/{name}")
 async def delete_actor(name: str):
-    actor_node = matcher.match("Actor", name=name).first()
-    if actor_node:
-        graph.delete(actor_node)
+    titles = repo.delete_actor(name)
+    if titles is not None:
+        publish_change("actor", "deleted", name, movies=titles)
         logging.info(f"Actor deleted: {name}")
         return {"message": f"Actor {name} deleted successfully"}
     raise HTTPException(status_code=404, detail="Actor not found")
@@ -182,41 +482,68 @@ async def delete_actor(name: str):
 @app.post("/movies", response_model=Movie)
 async def create_movie(movie: Movie):
     try:
-        movie_node = Node("Movie", **movie.dict())
-        graph.create(movie_node)
+        if write_batcher:
+            await write_batcher.submit("movie", movie.dict())
+            repo.invalidate({"type": "movie", "key": movie.title})
+        else:
+            repo.create_movie(movie.dict())
+        publish_change("movie", "created", movie.title)
         logging.info(f"Movie created: {movie.title}")
         return movie
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logging.error(f"Error creating movie: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/movies/{title}", response_model=Movie)
 async def read_movie(title: str):
-    movie_node = matcher.match("Movie", title=title).first()
-    if movie_node:
-        return Movie(**dict(movie_node))
+    movie = repo.get_movie(title)
+    if movie:
+        return Movie(**movie)
     raise HTTPException(status_code=404, detail="Movie not found")
 
 @app.get("/movies", response_model=List[Movie])
-async def read_movies():
-    movies = matcher.match("Movie")
-    return [Movie(**dict(movie)) for movie in movies]
+async def read_movies(response: Response,
+                      year_from: Optional[int] = None,
+                      year_to: Optional[int] = None,
+                      cursor: Optional[str] = None,
+                      limit: Optional[int] = Query(None, ge=1, le=1000)):
+    if year_from is None and year_to is None and cursor is None and limit is None:
+        return [Movie(**movie) for movie in repo.list_movies()]
+
+    # Year-ordered keyset pagination, served by the (year, title) index.
+    # Movies without a year are only listed by the unfiltered call above.
+    after_year, after_title = decode_cursor(cursor) if cursor else (None, None)
+    page_size = limit or DEFAULT_PAGE_SIZE
+    lower = max(year_from if year_from is not None else YEAR_MIN,
+                after_year if after_year is not None else YEAR_MIN)
+    upper = year_to if year_to is not None else YEAR_MAX
+
+    results = repo.movies_by_year(lower, upper, after_year, after_title, limit=page_size + 1)
+    movies = [Movie(**result) for result in results]
+    if len(movies) > page_size:
+        movies = movies[:page_size]
+        response.headers["X-Next-Cursor"] = encode_cursor(movies[-1].year, movies[-1].title)
+    return movies
 
 @app.put("/movies/{title}", response_model=Movie)
 async def update_movie(title: str, movie: Movie):
-    movie_node = matcher.match("Movie", title=title).first()
-    if movie_node:
-        movie_node.update(**movie.dict())
-        graph.push(movie_node)
+    updated = repo.update_movie(title, movie.dict())
+    if updated:
+        if movie.title != title:
+            publish_change("movie", "updated", title, title=movie.title)
+        else:
+            publish_change("movie", "updated", title)
         logging.info(f"Movie updated: {title}")
-        return Movie(**dict(movie_node))
+        return Movie(**updated)
     raise HTTPException(status_code=404, detail="Movie not found")
 
 @app.delete("/movies/{title}")
 async def delete_movie(title: str):
-    movie_node = matcher.match("Movie", title=title).first()
-    if movie_node:
-        graph.delete(movie_node)
+    names = repo.delete_movie(title)
+    if names is not None:
+        publish_change("movie", "deleted", title, actors=names)
         logging.info(f"Movie deleted: {title}")
         return {"message": f"Movie {title} deleted successfully"}
     raise HTTPException(status_code=404, detail="Movie not found")
@@ -225,32 +552,34 @@ async def delete_movie(title: str):
 @app.post("/actor_in_movie")
 async def add_actor_to_movie(relation: ActorInMovie):
     try:
-        actor_node = matcher.match("Actor", name=relation.actor_name).first()
-        movie_node = matcher.match("Movie", title=relation.movie_title).first()
-        
-        if not actor_node:
-            raise HTTPException(status_code=404, detail="Actor not found")
-        if not movie_node:
-            raise HTTPException(status_code=404, detail="Movie not found")
-        
-        acted_in = Relationship(actor_node, "ACTED_IN", movie_node)
-        graph.merge(acted_in)
+        if write_batcher:
+            result = await write_batcher.submit("link", relation.dict())
+            repo.invalidate({"type": "acted_in", "key": relation.actor_name, "data": {"movie": relation.movie_title}})
+            if not result.get("actor_found"):
+                raise HTTPException(status_code=404, detail="Actor not found")
+            if not result.get("movie_found"):
+                raise HTTPException(status_code=404, detail="Movie not found")
+        else:
+            actor_found, movie_found = repo.link(relation.actor_name, relation.movie_title)
+            if not actor_found:
+                raise HTTPException(status_code=404, detail="Actor not found")
+            if not movie_found:
+                raise HTTPException(status_code=404, detail="Movie not found")
         
+        publish_change("acted_in", "created", relation.actor_name, movie=relation.movie_title)
         logging.info(f"Relationship added: {relation.actor_name} ACTED_IN {relation.movie_title}")
         return {"message": f"Relationship added: {relation.actor_name} ACTED_IN {relation.movie_title}"}
+    except HTTPException:
+        raise
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logging.error(f"Error adding relationship: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 # TMDB Integration
-def fetch_actor_from_tmdb(actor_name):
-    search_url = f"{TMDB_BASE_URL}/search/person"
-    params = {
-        "api_key": TMDB_API_KEY,
-        "query": actor_name
-    }
-    response = requests.get(search_url, params=params)
-    data = response.json()
+async def fetch_actor_from_tmdb(actor_name):
+    data = await tmdb.search_person(actor_name)
 
     if data["results"]:
         actor_data = data["results"][0]
@@ -258,21 +587,15 @@ def fetch_actor_from_tmdb(actor_name):
         profile_path = actor_data.get("profile_path")  # Get profile path from search results
 
         # Fetch detailed actor info
-        details_url = f"{TMDB_BASE_URL}/person/{actor_id}"
-        params = {
-            "api_key": TMDB_API_KEY,
-            "append_to_response": "movie_credits"
-        }
-        response = requests.get(details_url, params=params)
-        actor_details = response.json()
+        actor_details = await tmdb.person_details(actor_id)
 
         filmography = []
         for movie in actor_details.get('movie_credits', {}).get('cast', []):
             if movie.get('release_date'):
-                year = movie['release_date'][:4]
                 filmography.append({
                     "title": movie['title'],
-                    "year": year
+                    "year": int(movie['release_date'][:4]),
+                    "release_date": movie['release_date']
                 })
 
         return {
@@ -285,31 +608,18 @@ def fetch_actor_from_tmdb(actor_name):
         }
     return None
 
-def add_actor_to_neo4j(actor_data):
-    actor_node = Node("Actor", 
-                     name=actor_data['name'],
-                     date_of_birth=actor_data['date_of_birth'],
-                     gender=actor_data['gender'],
-                     date_of_death=actor_data['date_of_death'],
-                     profile_path=actor_data['profile_path'])  # Add profile path to node
-    graph.merge(actor_node, "Actor", "name")
-
-    for movie in actor_data['filmography']:
-        movie_node = Node("Movie", title=movie['title'], year=movie['year'])
-        graph.merge(movie_node, "Movie", "title")
-        
-        acted_in = Relationship(actor_node, "ACTED_IN", movie_node)
-        graph.merge(acted_in)
-
-    logging.info(f"Actor added to Neo4j with filmography: {actor_data['name']}")
+def add_actor_to_graph(actor_data):
+    titles = repo.ingest_actor(actor_data)
+    publish_change("actor", "ingested", actor_data['name'], movies=titles)
+    logging.info(f"Actor added with filmography: {actor_data['name']}")
     return actor_data
 
 @app.post("/add_actor_from_tmdb/{actor_name}")
 async def add_actor_from_tmdb(actor_name: str):
     try:
-        actor_data = fetch_actor_from_tmdb(actor_name)
+        actor_data = await fetch_actor_from_tmdb(actor_name)
         if actor_data:
-            added_actor = add_actor_to_neo4j(actor_data)
+            added_actor = add_actor_to_graph(actor_data)
             return {
                 "message": f"Actor {actor_name} added successfully with filmography",
                 "data": {
@@ -321,27 +631,43 @@ async def add_actor_from_tmdb(actor_name: str):
             }
         else:
             raise HTTPException(status_code=404, detail=f"Actor {actor_name} not found in TMDB")
+    except TMDBUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logging.error(f"Error adding actor from TMDB: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
     
 @app.get("/actors/{name}/filmography", response_model=Optional[ActorFilmography])
-async def get_actor_filmography(name: str):
-    cypher_query = """
-    MATCH (a:Actor {name: $name})-[:ACTED_IN]->(m:Movie)
-    WITH a as actor, m
-    ORDER BY COALESCE(m.year, '') DESC, m.title
-    WITH actor, collect(m) as movies
-    RETURN actor, movies
-    """
-    
-    result = graph.run(cypher_query, name=name).data()
+async def get_actor_filmography(name: str,
+                                year_from: Optional[int] = None,
+                                year_to: Optional[int] = None,
+                                cursor: Optional[str] = None,
+                                limit: Optional[int] = Query(None, ge=1, le=1000)):
+    after_year, after_title = decode_cursor(cursor) if cursor else (None, None)
+    fetch = limit + 1 if limit else None
+    # The movie list comes from the shared catalog snapshot while its links are up to date
+    snapshot = snapshots.usable(links=True) if snapshots else None
+    if snapshot is not None:
+        movies = snapshot.filmography(name, year_from, year_to, after_year, after_title, fetch)
+        actor = repo.get_actor(name) if movies is not None else None
+        result = (actor, movies) if actor is not None else None
+    else:
+        result = repo.filmography(name,
+                                  year_from=year_from, year_to=year_to,
+                                  after_year=after_year, after_title=after_title,
+                                  limit=fetch)
     
-    if not result or not result[0]['actor']:
+    if result is None:
         return None
         
-    actor_data = result[0]['actor']
-    movies_data = result[0]['movies']
+    actor_data, movies_data = result
+
+    # Newest first; undated movies sort last as year 0
+    next_cursor = None
+    if limit and len(movies_data) > limit:
+        movies_data = movies_data[:limit]
+        last = movies_data[-1]
+        next_cursor = encode_cursor(last.get("year") or 0, last["title"])
     
     return {
         "actor": {
@@ -354,31 +680,27 @@ async def get_actor_filmography(name: str):
         "movies": [
             {
                 "title": movie["title"],
-                "year": movie.get("year")
+                "year": movie.get("year"),
+                "release_date": movie.get("release_date")
             } for movie in movies_data
-        ]
+        ],
+        "next_cursor": next_cursor
     }
 @app.put("/actors/{name}", response_model=Actor)
 async def update_actor(name: str, actor: Optional[Actor] = None):
     try:
-        actor_node = matcher.match("Actor", name=name).first()
-        if not actor_node:
+        if not repo.get_actor(name):
             raise HTTPException(status_code=404, detail="Actor not found")
 
         if actor:
             # Update with provided data
-            actor_node.update(**actor.dict(exclude_unset=True))
-            graph.push(actor_node)
+            updated = repo.update_actor(name, actor.dict(exclude_unset=True))
+            publish_change("actor", "updated", name)
+            return Actor(**updated)
         else:
             # Update from TMDB
             # Search for actor in TMDB
-            search_url = f"{TMDB_BASE_URL}/search/person"
-            params = {
-                "api_key": TMDB_API_KEY,
-                "query": name
-            }
-            response = requests.get(search_url, params=params)
-            data = response.json()
+            data = await tmdb.search_person(name)
 
             if not data["results"]:
                 return {"message": "No updates available from TMDB"}
@@ -387,82 +709,55 @@ async def update_actor(name: str, actor: Optional[Actor] = None):
             actor_id = actor_data["id"]
             
             # Fetch detailed actor info
-            details_url = f"{TMDB_BASE_URL}/person/{actor_id}"
-            params = {
-                "api_key": TMDB_API_KEY,
-                "append_to_response": "movie_credits"
-            }
-            details_response = requests.get(details_url, params=params)
-            actor_details = details_response.json()
-            
-            # Update actor in Neo4j
-            cypher_query = """
-            MATCH (a:Actor {name: $name})
-            SET a.profile_path = $profile_path,
-                a.gender = CASE WHEN $gender = 2 THEN 'Male' WHEN $gender = 1 THEN 'Female' ELSE a.gender END,
-                a.date_of_birth = COALESCE($birthday, a.date_of_birth),
-                a.date_of_death = COALESCE($deathday, a.date_of_death)
-            RETURN a
-            """
+            actor_details = await tmdb.person_details(actor_id)
             
-            result = graph.run(cypher_query, {
-                'name': name,
-                'profile_path': actor_data.get('profile_path'),
-                'gender': actor_details.get('gender'),
-                'birthday': actor_details.get('birthday'),
-                'deathday': actor_details.get('deathday')
-            }).data()
-
-            if result:
+            # Keep stored values where TMDB has none
+            changes = {"profile_path": actor_data.get('profile_path')}
+            if actor_details.get('gender') in (1, 2):
+                changes["gender"] = "Male" if actor_details['gender'] == 2 else "Female"
+            if actor_details.get('birthday'):
+                changes["date_of_birth"] = actor_details['birthday']
+            if actor_details.get('deathday'):
+                changes["date_of_death"] = actor_details['deathday']
+
+            updated = repo.update_actor(name, changes)
+            if updated:
+                publish_change("actor", "updated", name)
                 logging.info(f"Actor updated from TMDB: {name}")
                 return {
                     "message": "Actor updated successfully",
-                    "data": result[0]['a']
+                    "data": updated
                 }
                 
             return {"message": "No updates available"}
             
+    except TMDBUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logging.error(f"Error updating actor: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/movies/{title}/cast")
 async def get_movie_cast(title: str):
-    cypher_query = """
-    MATCH (m:Movie {title: $title})
-    OPTIONAL MATCH (a:Actor)-[:ACTED_IN]->(m)
-    WITH m as movie, collect(a) as unsorted_actors
-    WITH movie, [actor in unsorted_actors | actor {.*}] as actors_data
-    RETURN movie, apoc.coll.sort(actors_data, '^.name') as actors
-    """
+    snapshot = snapshots.usable(links=True) if snapshots else None
+    if snapshot is not None:
+        result = snapshot.cast(title)
+        if result is not None:
+            movie_data, names = result
+            result = movie_data, [{"name": name} for name in names]
+    else:
+        result = repo.cast(title)
     
-    # If you don't have APOC installed, use this simpler query instead:
-    alternative_query = """
-    MATCH (m:Movie {title: $title})
-    OPTIONAL MATCH (a:Actor)-[:ACTED_IN]->(m)
-    WITH m as movie, a
-    ORDER BY a.name
-    WITH movie, collect(a) as actors
-    RETURN movie, actors
-    """
-    
-    try:
-        # Try with APOC first
-        result = graph.run(cypher_query, title=title).data()
-    except Exception:
-        # Fall back to alternative query if APOC is not available
-        result = graph.run(alternative_query, title=title).data()
-    
-    if not result or not result[0]['movie']:
+    if result is None:
         raise HTTPException(status_code=404, detail="Movie not found")
         
-    movie_data = result[0]['movie']
-    actors_data = result[0]['actors']
+    movie_data, actors_data = result
     
     return {
         "movie": {
             "title": movie_data["title"],
-            "year": movie_data.get("year")
+            "year": movie_data.get("year"),
+            "release_date": movie_data.get("release_date")
         },
         "actors": [
             {
@@ -475,15 +770,8 @@ async def get_movie_cast(title: str):
 async def get_movie_poster(title: str):
     try:
         # Search for movie in TMDB
-        search_url = f"{TMDB_BASE_URL}/search/movie"
-        params = {
-            "api_key": TMDB_API_KEY,
-            "query": title,
-            "year": None  # You could add year if available for more accurate results
-        }
-        
-        response = requests.get(search_url, params=params)
-        data = response.json()
+        # You could pass year if available for more accurate results
+        data = await tmdb.search_movie(title)
         
         if data["results"]:
             # Return the first result's poster path
@@ -494,27 +782,140 @@ async def get_movie_poster(title: str):
         else:
             return {"poster_path": None, "tmdb_id": None}
             
+    except TMDBUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logging.error(f"Error fetching movie poster: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/health")
-async def health_check():
+@app.get("/changes", dependencies=[Depends(require_neo4j)])
+async def stream_changes(request: Request, since: Optional[int] = Query(None, ge=0)):
+    """
+    Server-sent events for every graph mutation, each tagged with the graph version.
+    Reconnecting clients resume from the Last-Event-ID header (or `since`).
+    """
+    last_event_id = request.headers.get("Last-Event-ID")
+    if last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+    return StreamingResponse(change_feed.stream(since, request),
+                             media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# Catalog statistics, served from precomputed counters
+@app.get("/stats", dependencies=[Depends(require_neo4j)])
+async def get_stats():
+    return stats.read_stats(graph)
+
+@app.get("/top/actors", dependencies=[Depends(require_neo4j)])
+async def get_top_actors(limit: int = Query(10, ge=1, le=100)):
+    return stats.read_top_actors(graph, limit)
+
+@app.get("/top/movies", dependencies=[Depends(require_neo4j)])
+async def get_top_movies(limit: int = Query(10, ge=1, le=100)):
+    return stats.read_top_movies(graph, limit)
+
+@app.post("/stats/backfill", dependencies=[Depends(require_neo4j)])
+async def backfill_stats():
     try:
-        # Test Neo4j connection
-        neo4j_status = graph.run("RETURN 1").evaluate() == 1
-    except Exception:
-        neo4j_status = False
+        await asyncio.to_thread(stats.backfill, graph)
+        return {"message": "Catalog statistics backfilled"}
+    except Exception as e:
+        logging.error(f"Error backfilling statistics: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/health")
+async def health_check():
+    # Served from the cached readiness state so probes never query Neo4j
     return {
         "status": "healthy",
         "timestamp": datetime.utcnow().isoformat(),
         "services": {
-            "neo4j": "up" if neo4j_status else "down",
+            "neo4j": readiness["neo4j"],
+            "tmdb": "down" if tmdb.breaker.state == "open" else "up",
             "api": "up"
         }
     }
 
+@app.get("/livez")
+async def liveness():
+    return {"status": "alive"}
+
+@app.get("/readyz")
+async def readiness_check():
+    if STORAGE_BACKEND == "memory":
+        return {"status": "ready" if repo is not None else "not ready", "storage": STORAGE_BACKEND}
+    ready = graph is not None and readiness["neo4j"] == "up"
+    return JSONResponse(status_code=200 if ready else 503, content={
+        "status": "ready" if ready else "not ready",
+        **readiness,
+        "server": registry.server,
+        "catalog_snapshot": {"version": snapshots.current.version, "stale": snapshots.stale,
+                             "links_stale": snapshots.links_stale}
+                            if snapshots and snapshots.current else None,
+        "capabilities": sorted(c for c in registry.capabilities if not c.startswith("index:"))
+    })
+
+# The body is parsed as it streams in rather than through an UploadFile
+# parameter, which would spool the whole file before the handler runs
+IMPORT_REQUEST_BODY = {
+    "required": True,
+    "content": {"multipart/form-data": {"schema": {
+        "type": "object",
+        "required": ["file"],
+        "properties": {"file": {"type": "string", "format": "binary"}},
+    }}},
+}
+
+@app.post("/import", status_code=202, dependencies=[Depends(require_neo4j)],
+          openapi_extra={"requestBody": IMPORT_REQUEST_BODY})
+async def start_import(request: Request, format: Optional[str] = None):
+    try:
+        job = await importer.submit(graph, request.headers.get("content-type"), request.stream(), format)
+        logging.info(f"Import {job.id} uploaded: {job.filename} ({job.format})")
+        return job.to_dict()
+    except ImportBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logging.error(f"Error starting import: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/import", dependencies=[Depends(require_neo4j)])
+async def list_imports():
+    return importer.list()
+
+@app.get("/import/{job_id}", dependencies=[Depends(require_neo4j)])
+async def read_import(job_id: str):
+    job = importer.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job.to_dict()
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not PROFILE_TOKEN or x_admin_token != PROFILE_TOKEN:
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+def get_profile(profile_id: str):
+    profile = profiles.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
+@app.get("/admin/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    return profiles.list()
+
+@app.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def read_profile(profile_id: str):
+    return get_profile(profile_id).to_dict()
+
+@app.get("/admin/profiles/{profile_id}/flamegraph", dependencies=[Depends(require_admin)],
+         response_class=PlainTextResponse)
+async def read_profile_flamegraph(profile_id: str):
+    # Folded stacks; feed to flamegraph.pl or paste into speedscope
+    return get_profile(profile_id).folded()
+
 @app.post("/seed/actors")
 async def seed_actors():
     """
@@ -650,7 +1051,7 @@ async def seed_actors():
                 
                 try:
                     # Check if actor already exists
-                    existing_actor = matcher.match("Actor", name=clean_name).first()
+                    existing_actor = repo.get_actor(clean_name)
                     
                     if existing_actor:
                         results["success"].append({
@@ -662,9 +1063,9 @@ async def seed_actors():
                         continue
                     
                     # Fetch data from TMDB and create actor
-                    actor_data = fetch_actor_from_tmdb(clean_name)
+                    actor_data = await fetch_actor_from_tmdb(clean_name)
                     if actor_data:
-                        add_actor_to_neo4j(actor_data)
+                        add_actor_to_graph(actor_data)
                         results["success"].append({
                             "name": clean_name,
                             "gender": gender,
@@ -0,0 +1,73 @@
+import os
+import time
+import uuid
+import logging
+from queries import registry
+
+# Workers booting together take turns through a lease on a lock node, renewed
+# before every step; a crashed holder's lease runs out after LOCK_LEASE seconds
+LOCK_LEASE = 600
+LOCK_POLL_INTERVAL = 2
+LOCK_CONSTRAINT = ("CREATE CONSTRAINT migration_lock_id_unique IF NOT EXISTS "
+                   "FOR (l:MigrationLock) REQUIRE l.id IS UNIQUE")
+
+# Data migrations, applied in order and recorded as (:SchemaMigration {id}) nodes
+# so each runs once per database. Every step is a named query from queries.py.
+MIGRATIONS = [
+    # Movie.year was stored as a string (release_date[:4]); store it as an integer
+    # and rebuild the films-per-year histogram with integer keys
+    ("movie_year_int", ["migrate.movie_year_to_int", "stats.backfill_years"]),
+    # Counter nodes could be duplicated by racing MERGEs before they had
+    # uniqueness constraints; keep one of each and recount
+    ("unique_stats_counters", ["migrate.dedupe_catalog_stats", "stats.backfill_catalog", "stats.backfill_years"]),
+    # Likewise for the change feed's version counter and the events it numbered
+    ("unique_change_feed", ["migrate.dedupe_graph_version", "migrate.dedupe_change_events"]),
+]
+
+
+def _lock(graph, owner):
+    return registry.run(graph, "migrate.lock", owner=owner, lease_ms=LOCK_LEASE * 1000).evaluate() == owner
+
+
+def run_migrations(graph, wait=LOCK_LEASE):
+    """Apply pending migrations, waiting up to `wait` seconds for another worker doing the same."""
+    try:
+        graph.run(LOCK_CONSTRAINT)
+    except Exception as e:
+        # Another worker creating it at the same moment; the lease still serialises
+        logging.warning(f"Could not create the migration lock constraint: {str(e)}")
+
+    owner = uuid.uuid4().hex
+    deadline = time.monotonic() + wait
+    while not _lock(graph, owner):
+        if time.monotonic() > deadline:
+            raise RuntimeError("Timed out waiting for another worker's migrations")
+        time.sleep(LOCK_POLL_INTERVAL)
+
+    try:
+        # Read under the lock, so migrations another worker just applied are skipped
+        applied = {row["id"] for row in registry.run(graph, "migrate.applied").data()}
+        for migration_id, steps in MIGRATIONS:
+            if migration_id in applied:
+                continue
+            logging.info(f"Applying migration {migration_id}")
+            for name in steps:
+                if not _lock(graph, owner):
+                    raise RuntimeError(f"Lost the migration lock during {migration_id}")
+                registry.run(graph, name)
+            registry.run(graph, "migrate.record", id=migration_id)
+            logging.info(f"Migration {migration_id} applied")
+    finally:
+        registry.run(graph, "migrate.unlock", owner=owner)
+
+
+if __name__ == "__main__":
+    # Migration job: python migrations.py
+    from py2neo import Graph
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    db = Graph(os.getenv("NEO4J_URI", "bolt://localhost:7687"),
+               auth=(os.getenv("NEO4J_USER", "neo4j"), os.getenv("NEO4J_PASSWORD", "password")),
+               name="neo4j")
+    registry.probe(db)
+    run_migrations(db)
@@ -0,0 +1,195 @@
+import asyncio
+import contextvars
+import functools
+import time
+import uuid
+from collections import OrderedDict
+from fastapi.routing import APIRoute
+
+# The span currently open in this request, or None when the request is not
+# being profiled. Instrumented code only pays for this lookup when profiling is off.
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "attrs", "start", "end", "children")
+
+    def __init__(self, name, attrs=None):
+        self.name = name
+        self.attrs = attrs or {}
+        self.start = time.perf_counter()
+        self.end = None
+        self.children = []
+
+    @property
+    def duration_ms(self):
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+
+    def to_dict(self, origin):
+        node = {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round(self.duration_ms, 3),
+        }
+        if self.attrs:
+            node["attrs"] = self.attrs
+        if self.children:
+            node["children"] = [child.to_dict(origin) for child in self.children]
+        return node
+
+
+class _ActiveSpan:
+    __slots__ = ("span", "token")
+
+    def __init__(self, parent, name, attrs):
+        self.span = Span(name, attrs)
+        parent.children.append(self.span)
+
+    def __enter__(self):
+        self.token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, *exc):
+        self.span.end = time.perf_counter()
+        _current_span.reset(self.token)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def span(name, **attrs):
+    """Time a block as a child of the current span; a no-op when not profiling."""
+    parent = _current_span.get()
+    if parent is None:
+        return NOOP_SPAN
+    return _ActiveSpan(parent, name, attrs)
+
+
+def profiling_active():
+    return _current_span.get() is not None
+
+
+def _timed_endpoint(endpoint):
+    # functools.wraps keeps the signature FastAPI reads the parameters from
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def timed(*args, **kwargs):
+            with span("handler"):
+                return await endpoint(*args, **kwargs)
+    else:
+        @functools.wraps(endpoint)
+        def timed(*args, **kwargs):
+            with span("handler"):
+                return endpoint(*args, **kwargs)
+    return timed
+
+
+class ProfiledRoute(APIRoute):
+    """
+    Times the endpoint as a `handler` span, and everything FastAPI does with its
+    return value afterwards (response_model validation, JSON encoding and
+    rendering) as `serialise`.
+    """
+
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        route_handler = super().get_route_handler()
+
+        async def profiled_route_handler(request):
+            parent = _current_span.get()
+            response = await route_handler(request)
+            if parent is not None:
+                handler = next((child for child in reversed(parent.children) if child.name == "handler"), None)
+                if handler is not None and handler.end is not None:
+                    serialise = Span("serialise")
+                    serialise.start = handler.end
+                    serialise.end = time.perf_counter()
+                    parent.children.append(serialise)
+            return response
+
+        return profiled_route_handler
+
+
+class Profile:
+    def __init__(self, method, path, request_id=None):
+        self.id = uuid.uuid4().hex
+        self.request_id = request_id
+        self.method = method
+        self.path = path
+        self.route = None
+        self.status_code = None
+        self.created_at = time.time()
+        self.root = Span("request", {"method": method, "path": path})
+        self._token = None
+
+    def __enter__(self):
+        self._token = _current_span.set(self.root)
+        return self
+
+    def __exit__(self, *exc):
+        self.root.end = time.perf_counter()
+        _current_span.reset(self._token)
+        return False
+
+    def summary(self):
+        return {
+            "id": self.id,
+            "request_id": self.request_id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status_code": self.status_code,
+            "created_at": self.created_at,
+            "duration_ms": round(self.root.duration_ms, 3),
+        }
+
+    def to_dict(self):
+        return {**self.summary(), "spans": self.root.to_dict(self.root.start)}
+
+    def folded(self):
+        """Folded stacks ("a;b;c <microseconds>") for flame graph tools."""
+        lines = []
+
+        def walk(node, prefix):
+            path = f"{prefix};{node.name}" if prefix else node.name
+            self_time = node.duration_ms - sum(child.duration_ms for child in node.children)
+            if self_time > 0:
+                lines.append(f"{path} {int(self_time * 1000)}")
+            for child in node.children:
+                walk(child, path)
+
+        walk(self.root, "")
+        return "\n".join(lines) + "\n"
+
+
+class ProfileStore:
+    """Keeps the most recent profiles in memory for the admin endpoints."""
+
+    def __init__(self, max_profiles=100):
+        self.max_profiles = max_profiles
+        self._profiles = OrderedDict()
+
+    def add(self, profile):
+        self._profiles[profile.id] = profile
+        while len(self._profiles) > self.max_profiles:
+            self._profiles.popitem(last=False)
+
+    def get(self, profile_id):
+        return self._profiles.get(profile_id)
+
+    def list(self):
+        return [profile.summary() for profile in reversed(self._profiles.values())]
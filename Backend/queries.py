@@ -0,0 +1,496 @@
+import logging
+from log_config import record_query
+from profiling import span, profiling_active
+
+
+class NamedQuery:
+    """
+    A named, parameterised Cypher query with one or more variants.
+
+    Variants are (requirements, cypher) pairs in order of preference. The first
+    variant whose requirements are all present in the probed server capabilities
+    is used. `sample_params` are typed placeholder values used to warm the plan cache.
+    """
+
+    def __init__(self, name, variants, sample_params=None, warm=True):
+        self.name = name
+        self.variants = variants
+        self.sample_params = sample_params or {}
+        self.warm = warm
+
+
+class QueryRegistry:
+    def __init__(self):
+        self.queries = {}
+        self.capabilities = set()
+        self.server = {"version": None, "edition": None, "indexes": []}
+        self._selected = {}
+
+    def register(self, name, cypher=None, variants=None, sample_params=None, warm=True):
+        if variants is None:
+            variants = [(set(), cypher)]
+        self.queries[name] = NamedQuery(name, variants, sample_params, warm)
+        self._selected.pop(name, None)
+
+    def probe(self, graph):
+        """Detect server capabilities once and select the best variant of every query."""
+        capabilities = set()
+
+        try:
+            row = graph.run("CALL dbms.components() YIELD versions, edition "
+                            "RETURN versions[0] AS version, edition").data()[0]
+            self.server["version"] = row["version"]
+            self.server["edition"] = row["edition"]
+            if int(row["version"].split(".")[0]) >= 5:
+                capabilities.add("neo4j5")
+        except Exception as e:
+            logging.warning(f"Could not determine Neo4j version: {str(e)}")
+
+        try:
+            graph.run("RETURN apoc.version()").evaluate()
+            capabilities.add("apoc")
+        except Exception:
+            pass
+
+        try:
+            self.server["indexes"] = [row["name"] for row in graph.run(
+                "SHOW INDEXES YIELD name, state WHERE state = 'ONLINE' RETURN name").data()]
+            capabilities.update(f"index:{name}" for name in self.server["indexes"])
+        except Exception as e:
+            logging.warning(f"Could not list indexes: {str(e)}")
+
+        self.capabilities = capabilities
+        self._selected = {}
+        for name in self.queries:
+            self.cypher(name)
+        logging.info(f"Neo4j {self.server['version']} ({self.server['edition']}), "
+                     f"capabilities: {sorted(c for c in capabilities if not c.startswith('index:'))}")
+
+    def cypher(self, name):
+        if name not in self._selected:
+            query = self.queries[name]
+            for requirements, cypher in query.variants:
+                if requirements <= self.capabilities:
+                    self._selected[name] = cypher
+                    break
+            else:
+                raise RuntimeError(f"No variant of query {name} is supported by this server")
+        return self._selected[name]
+
+    def warm(self, graph):
+        """Plan every selected query with EXPLAIN so the first real request skips planning."""
+        for name, query in self.queries.items():
+            if not query.warm:
+                continue
+            try:
+                graph.run(f"EXPLAIN {self.cypher(name)}", **query.sample_params)
+            except Exception as e:
+                logging.warning(f"Could not warm query {name}: {str(e)}")
+
+    def run(self, graph, name, **params):
+        record_query(name)
+        if not profiling_active():
+            return graph.run(self.cypher(name), **params)
+        with span("cypher", query=name):
+            return ProfiledCursor(graph.run(self.cypher(name), **params), name)
+
+
+class ProfiledCursor:
+    """Wraps a py2neo cursor so fetching results shows up as its own span."""
+
+    def __init__(self, cursor, name):
+        self._cursor = cursor
+        self._name = name
+
+    def data(self, *keys):
+        with span("materialise", query=self._name):
+            return self._cursor.data(*keys)
+
+    def evaluate(self, field=0):
+        with span("materialise", query=self._name):
+            return self._cursor.evaluate(field)
+
+    def __iter__(self):
+        with span("materialise", query=self._name):
+            return iter(list(self._cursor))
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+registry = QueryRegistry()
+
+
+# Search and autocomplete, one query per label
+for search_type, label, property_name in (("actor", "Actor", "name"), ("movie", "Movie", "title")):
+    registry.register(f"autocomplete.{search_type}", f"""
+    MATCH (n:{label})
+    WHERE toLower(n.{property_name}) CONTAINS toLower($query)
+    WITH n,
+         CASE WHEN toLower(n.{property_name}) = toLower($query) THEN 0
+              WHEN toLower(n.{property_name}) STARTS WITH toLower($query) THEN 1
+              ELSE 2 END as relevance
+    ORDER BY relevance, n.{property_name}
+    RETURN n.{property_name} AS name, relevance
+    LIMIT 10
+    """, sample_params={"query": ""})
+
+    registry.register(f"search.{search_type}", f"""
+    MATCH (n:{label})
+    WHERE toLower(n.{property_name}) CONTAINS toLower($query)
+    WITH n,
+         CASE WHEN toLower(n.{property_name}) = toLower($query) THEN 0
+              WHEN toLower(n.{property_name}) STARTS WITH toLower($query) THEN 1
+              ELSE 2 END as relevance
+    ORDER BY relevance, n.{property_name}
+    RETURN n
+    LIMIT 20
+    """, sample_params={"query": ""})
+
+registry.register("health.ping", "RETURN 1")
+
+# Filmography, newest first, with optional year range and keyset pagination.
+# Undated movies sort last (as year 0). $after_year/$after_title are the sort
+# key of the last movie on the previous page; $fetch caps the page size.
+registry.register("actor.filmography", """
+    MATCH (a:Actor {name: $name})
+    OPTIONAL MATCH (a)-[:ACTED_IN]->(m:Movie)
+    WHERE ($year_from IS NULL OR m.year >= $year_from)
+      AND ($year_to IS NULL OR m.year <= $year_to)
+      AND ($after_year IS NULL
+           OR coalesce(m.year, 0) < $after_year
+           OR (coalesce(m.year, 0) = $after_year AND m.title > $after_title))
+    WITH a, m
+    ORDER BY coalesce(m.year, 0) DESC, m.title
+    WITH a as actor, collect(m) as movies
+    RETURN actor, CASE WHEN $fetch IS NULL THEN movies ELSE movies[..$fetch] END as movies
+    """, sample_params={"name": "", "year_from": 0, "year_to": 0,
+                        "after_year": 0, "after_title": "", "fetch": 0})
+
+# Movies ordered by (year, title) within a year range, served by the
+# movie_year_title index. $lower already includes the cursor year, so the
+# last predicate only skips earlier titles within that year.
+registry.register("movies.by_year", """
+    MATCH (m:Movie)
+    WHERE m.year >= $lower AND m.year <= $upper AND m.title IS NOT NULL
+      AND ($after_year IS NULL OR m.year > $after_year OR m.title > $after_title)
+    RETURN m
+    ORDER BY m.year, m.title
+    LIMIT $fetch
+    """, sample_params={"lower": 0, "upper": 0, "after_year": 0, "after_title": "", "fetch": 0})
+
+registry.register("movie.cast", variants=[
+    ({"apoc"}, """
+    MATCH (m:Movie {title: $title})
+    OPTIONAL MATCH (a:Actor)-[:ACTED_IN]->(m)
+    WITH m as movie, collect(a) as unsorted_actors
+    WITH movie, [actor in unsorted_actors | actor {.*}] as actors_data
+    RETURN movie, apoc.coll.sortMaps(actors_data, '^name') as actors
+    """),
+    (set(), """
+    MATCH (m:Movie {title: $title})
+    OPTIONAL MATCH (a:Actor)-[:ACTED_IN]->(m)
+    WITH m as movie, a
+    ORDER BY a.name
+    WITH movie, collect(a) as actors
+    RETURN movie, actors
+    """),
+], sample_params={"title": ""})
+
+
+# Batched writes (see write_batcher.py). Each row carries the index of the caller
+# that queued it so results can be routed back to the right request. The queries
+# also maintain the precomputed counters described in stats.py.
+registry.register("batch.actor", """
+    UNWIND $rows AS row
+    CREATE (a:Actor)
+    SET a = row.props, a.movie_count = 0
+    WITH row, a
+    MERGE (s:CatalogStats {id: 'catalog'})
+    SET s.actor_count = coalesce(s.actor_count, 0) + 1,
+        s.deceased_count = coalesce(s.deceased_count, 0) +
+            CASE WHEN coalesce(a.date_of_death, '') <> '' THEN 1 ELSE 0 END
+    RETURN row.idx AS idx
+    """, sample_params={"rows": []})
+
+registry.register("batch.movie", """
+    UNWIND $rows AS row
+    CREATE (m:Movie)
+    SET m = row.props, m.cast_size = 0
+    WITH row, m
+    MERGE (s:CatalogStats {id: 'catalog'})
+    SET s.movie_count = coalesce(s.movie_count, 0) + 1
+    WITH row, m
+    FOREACH (_ IN CASE WHEN m.year IS NULL THEN [] ELSE [1] END |
+        MERGE (y:YearStats {year: m.year})
+        SET y.movie_count = coalesce(y.movie_count, 0) + 1)
+    RETURN row.idx AS idx
+    """, sample_params={"rows": []})
+
+registry.register("batch.link", """
+    UNWIND $rows AS row
+    OPTIONAL MATCH (a:Actor {name: row.actor_name})
+    WITH row, head(collect(a)) AS a
+    OPTIONAL MATCH (m:Movie {title: row.movie_title})
+    WITH row, a, head(collect(m)) AS m
+    FOREACH (_ IN CASE WHEN a IS NOT NULL AND m IS NOT NULL THEN [1] ELSE [] END |
+        MERGE (a)-[:ACTED_IN]->(m)
+        ON CREATE SET a.movie_count = coalesce(a.movie_count, 0) + 1,
+                      m.cast_size = coalesce(m.cast_size, 0) + 1)
+    RETURN row.idx AS idx, a IS NOT NULL AS actor_found, m IS NOT NULL AS movie_found
+    """, sample_params={"rows": []})
+
+
+# Bulk import (see bulk_import.py). Degree and catalog counters are
+# recomputed by a stats backfill once the whole file is in.
+registry.register("import.rows", """
+    UNWIND $rows AS row
+    MERGE (a:Actor {name: row.name})
+    ON CREATE SET a.movie_count = 0
+    SET a.date_of_birth = coalesce(row.date_of_birth, a.date_of_birth),
+        a.gender = coalesce(row.gender, a.gender),
+        a.date_of_death = coalesce(row.date_of_death, a.date_of_death)
+    WITH a, row
+    WHERE row.movie_title IS NOT NULL
+    MERGE (m:Movie {title: row.movie_title})
+    ON CREATE SET m.cast_size = 0
+    SET m.year = coalesce(m.year, row.year)
+    MERGE (a)-[:ACTED_IN]->(m)
+    """, sample_params={"rows": []})
+
+# Change feed (see change_feed.py). Versions come from a single GraphVersion
+# counter; SET takes its write lock, so concurrent batches get disjoint ranges.
+registry.register("changes.publish", """
+    MERGE (c:GraphVersion {id: 'graph'})
+    SET c.version = coalesce(c.version, 0) + size($events)
+    WITH c.version - size($events) AS base
+    UNWIND range(0, size($events) - 1) AS i
+    WITH base + i + 1 AS version, $events[i] AS event
+    CREATE (:ChangeEvent {version: version, type: event.type, op: event.op, key: event.key,
+                          data: event.data, ts: timestamp()})
+    """, sample_params={"events": []})
+
+registry.register("changes.since", """
+    MATCH (e:ChangeEvent) WHERE e.version > $since
+    RETURN e.version AS version, e.type AS type, e.op AS op, e.key AS key, e.data AS data, e.ts AS ts
+    ORDER BY e.version
+    LIMIT $limit
+    """, sample_params={"since": 0, "limit": 0})
+
+registry.register("changes.version", """
+    OPTIONAL MATCH (c:GraphVersion {id: 'graph'})
+    RETURN coalesce(c.version, 0)
+    """)
+
+registry.register("changes.prune", """
+    MATCH (e:ChangeEvent) WHERE e.version <= $cutoff
+    CALL { WITH e DELETE e } IN TRANSACTIONS OF 10000 ROWS
+    """, warm=False)
+
+
+# Catalog snapshot export (see catalog_snapshot.py)
+registry.register("snapshot.actors", """
+    MATCH (a:Actor)
+    RETURN a.name AS name
+    """, warm=False)
+
+registry.register("snapshot.movies", """
+    MATCH (m:Movie)
+    RETURN m.title AS title, m.year AS year, m.release_date AS release_date
+    """, warm=False)
+
+registry.register("snapshot.edges", """
+    MATCH (a:Actor)-[:ACTED_IN]->(m:Movie)
+    RETURN a.name AS name, m.title AS title
+    """, warm=False)
+
+# Whether events of the given $types may have followed the graph version a
+# snapshot was built at: true if any did, or if the events that followed are
+# no longer retained and so cannot be checked
+registry.register("snapshot.stale", """
+    OPTIONAL MATCH (c:GraphVersion {id: 'graph'})
+    WITH coalesce(c.version, 0) AS current
+    OPTIONAL MATCH (e:ChangeEvent) WHERE e.version > $since
+    WITH current, min(e.version) AS oldest,
+         count(CASE WHEN e.type IN $types THEN 1 END) AS changes
+    RETURN current > $since AND (oldest IS NULL OR oldest > $since + 1 OR changes > 0)
+    """, sample_params={"since": 0, "types": []})
+
+
+# Data migrations (see migrations.py)
+registry.register("migrate.applied", """
+    MATCH (s:SchemaMigration)
+    RETURN s.id AS id
+    """)
+
+registry.register("migrate.record", """
+    MERGE (s:SchemaMigration {id: $id})
+    SET s.applied_at = datetime()
+    """, warm=False)
+
+# Lease on the migration lock node. REMOVE takes the node's write lock before the
+# owner is read, so concurrent workers serialise here instead of both seeing it free.
+registry.register("migrate.lock", """
+    MERGE (l:MigrationLock {id: 'migrations'})
+    REMOVE l._lock
+    WITH l
+    WHERE l.owner IS NULL OR l.owner = $owner OR l.expires_at < timestamp()
+    SET l.owner = $owner, l.expires_at = timestamp() + $lease_ms
+    RETURN l.owner AS owner
+    """, warm=False)
+
+registry.register("migrate.unlock", """
+    MATCH (l:MigrationLock {id: 'migrations'}) WHERE l.owner = $owner
+    REMOVE l.owner, l.expires_at
+    """, warm=False)
+
+registry.register("migrate.dedupe_catalog_stats", """
+    MATCH (s:CatalogStats {id: 'catalog'})
+    WITH collect(s) AS counters
+    FOREACH (s IN counters[1..] | DETACH DELETE s)
+    """, warm=False)
+
+registry.register("migrate.dedupe_graph_version", """
+    MATCH (c:GraphVersion {id: 'graph'})
+    WITH c ORDER BY c.version DESC
+    WITH collect(c) AS counters
+    FOREACH (c IN counters[1..] | DETACH DELETE c)
+    """, warm=False)
+
+registry.register("migrate.dedupe_change_events", """
+    MATCH (e:ChangeEvent)
+    WITH e.version AS version, collect(e) AS events
+    WHERE size(events) > 1
+    FOREACH (e IN events[1..] | DETACH DELETE e)
+    """, warm=False)
+
+registry.register("migrate.movie_year_to_int", """
+    MATCH (m:Movie) WHERE m.year IS NOT NULL AND toString(m.year) = m.year
+    CALL { WITH m SET m.year = toInteger(m.year) } IN TRANSACTIONS OF 10000 ROWS
+    """, warm=False)
+
+
+# Catalog statistics (see stats.py). Degree counts use COUNT {} subqueries on
+# Neo4j 5 and the older size() pattern syntax elsewhere.
+ACTOR_DEGREE = {"neo4j5": "COUNT { (a)-[:ACTED_IN]->() }", "legacy": "size((a)-[:ACTED_IN]->())"}
+MOVIE_DEGREE = {"neo4j5": "COUNT { ()-[:ACTED_IN]->(m) }", "legacy": "size(()-[:ACTED_IN]->(m))"}
+
+registry.register("stats.catalog_delta", """
+    MERGE (s:CatalogStats {id: 'catalog'})
+    SET s.actor_count = coalesce(s.actor_count, 0) + $actors,
+        s.deceased_count = coalesce(s.deceased_count, 0) + $deceased,
+        s.movie_count = coalesce(s.movie_count, 0) + $movies
+    """, sample_params={"actors": 0, "deceased": 0, "movies": 0})
+
+registry.register("stats.year_delta", """
+    UNWIND $deltas AS delta
+    MERGE (y:YearStats {year: delta.year})
+    SET y.movie_count = coalesce(y.movie_count, 0) + delta.count
+    """, sample_params={"deltas": []})
+
+registry.register("stats.refresh_actor_degrees", variants=[
+    ({"neo4j5"}, f"""
+    UNWIND $names AS name
+    MATCH (a:Actor {{name: name}})
+    SET a.movie_count = {ACTOR_DEGREE['neo4j5']}
+    """),
+    (set(), f"""
+    UNWIND $names AS name
+    MATCH (a:Actor {{name: name}})
+    SET a.movie_count = {ACTOR_DEGREE['legacy']}
+    """),
+], sample_params={"names": []})
+
+registry.register("stats.refresh_movie_degrees", variants=[
+    ({"neo4j5"}, f"""
+    UNWIND $titles AS title
+    MATCH (m:Movie {{title: title}})
+    SET m.cast_size = {MOVIE_DEGREE['neo4j5']}
+    """),
+    (set(), f"""
+    UNWIND $titles AS title
+    MATCH (m:Movie {{title: title}})
+    SET m.cast_size = {MOVIE_DEGREE['legacy']}
+    """),
+], sample_params={"titles": []})
+
+registry.register("stats.movie_years", """
+    UNWIND $titles AS title
+    MATCH (m:Movie {title: title})
+    RETURN m.title AS title, m.year AS year
+    """, sample_params={"titles": []})
+
+registry.register("stats.linked_names", """
+    MATCH (:Movie {title: $title})<-[:ACTED_IN]-(a:Actor)
+    RETURN DISTINCT a.name AS name
+    """, sample_params={"title": ""})
+
+registry.register("stats.linked_titles", """
+    MATCH (:Actor {name: $name})-[:ACTED_IN]->(m:Movie)
+    RETURN DISTINCT m.title AS title
+    """, sample_params={"name": ""})
+
+registry.register("stats.backfill_actor_degrees", variants=[
+    ({"neo4j5"}, f"""
+    MATCH (a:Actor)
+    CALL {{ WITH a SET a.movie_count = {ACTOR_DEGREE['neo4j5']} }} IN TRANSACTIONS OF 10000 ROWS
+    """),
+    (set(), f"""
+    MATCH (a:Actor)
+    CALL {{ WITH a SET a.movie_count = {ACTOR_DEGREE['legacy']} }} IN TRANSACTIONS OF 10000 ROWS
+    """),
+], warm=False)
+
+registry.register("stats.backfill_movie_degrees", variants=[
+    ({"neo4j5"}, f"""
+    MATCH (m:Movie)
+    CALL {{ WITH m SET m.cast_size = {MOVIE_DEGREE['neo4j5']} }} IN TRANSACTIONS OF 10000 ROWS
+    """),
+    (set(), f"""
+    MATCH (m:Movie)
+    CALL {{ WITH m SET m.cast_size = {MOVIE_DEGREE['legacy']} }} IN TRANSACTIONS OF 10000 ROWS
+    """),
+], warm=False)
+
+registry.register("stats.backfill_years", """
+    MATCH (y:YearStats) DETACH DELETE y
+    WITH count(*) AS cleared
+    MATCH (m:Movie) WHERE m.year IS NOT NULL
+    WITH m.year AS year, count(*) AS movies
+    CREATE (:YearStats {year: year, movie_count: movies})
+    """, warm=False)
+
+registry.register("stats.backfill_catalog", """
+    OPTIONAL MATCH (a:Actor)
+    WITH count(a) AS actors,
+         count(CASE WHEN coalesce(a.date_of_death, '') <> '' THEN 1 END) AS deceased
+    OPTIONAL MATCH (m:Movie)
+    WITH actors, deceased, count(m) AS movies
+    MERGE (s:CatalogStats {id: 'catalog'})
+    SET s.actor_count = actors, s.deceased_count = deceased, s.movie_count = movies
+    """, warm=False)
+
+registry.register("stats.catalog", """
+    OPTIONAL MATCH (s:CatalogStats {id: 'catalog'})
+    RETURN s
+    """)
+
+registry.register("stats.films_per_year", """
+    MATCH (y:YearStats) WHERE y.year IS NOT NULL AND y.movie_count > 0
+    RETURN y.year AS year, y.movie_count AS count
+    ORDER BY y.year
+    """)
+
+registry.register("stats.top_actors", """
+    MATCH (a:Actor) WHERE a.movie_count IS NOT NULL
+    RETURN a.name AS name, a.movie_count AS count
+    ORDER BY a.movie_count DESC
+    LIMIT $limit
+    """, sample_params={"limit": 10})
+
+registry.register("stats.top_movies", """
+    MATCH (m:Movie) WHERE m.cast_size IS NOT NULL
+    RETURN m.title AS title, m.year AS year, m.cast_size AS count
+    ORDER BY m.cast_size DESC
+    LIMIT $limit
+    """, sample_params={"limit": 10})
@@ -0,0 +1,756 @@
+import os
+import sys
+import time
+import logging
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from bisect import bisect_left, bisect_right, insort
+from py2neo import Node, Relationship, NodeMatcher
+from queries import registry
+from profiling import span
+import stats
+
+# Storage behind the API handlers. Nodes are exchanged as plain property dicts;
+# actor names and movie titles are their keys.
+#
+#   Neo4jRepository       the production backend, keeping the catalog counters
+#                         in stats.py up to date as it writes
+#   InMemoryRepository    an indexed in-process graph, for running and testing
+#                         the API without Neo4j and as a benchmark baseline
+#   ReadThroughRepository Neo4j with an InMemoryRepository caching hot lookups
+
+SEARCH_LIMIT = 20
+AUTOCOMPLETE_LIMIT = 10
+
+
+class GraphRepository(ABC):
+    # Actors
+    @abstractmethod
+    def get_actor(self, name):
+        """Return the actor's properties, or None."""
+
+    @abstractmethod
+    def list_actors(self):
+        pass
+
+    @abstractmethod
+    def create_actor(self, actor):
+        pass
+
+    @abstractmethod
+    def update_actor(self, name, changes):
+        """Apply `changes` and return the updated properties, or None if missing."""
+
+    @abstractmethod
+    def delete_actor(self, name):
+        """Delete the actor and return the titles it was linked to, or None if missing."""
+
+    # Movies
+    @abstractmethod
+    def get_movie(self, title):
+        pass
+
+    @abstractmethod
+    def list_movies(self):
+        pass
+
+    @abstractmethod
+    def create_movie(self, movie):
+        pass
+
+    @abstractmethod
+    def update_movie(self, title, changes):
+        pass
+
+    @abstractmethod
+    def delete_movie(self, title):
+        """Delete the movie and return the names linked to it, or None if missing."""
+
+    @abstractmethod
+    def movies_by_year(self, lower, upper, after_year=None, after_title=None, limit=100):
+        """Dated movies ordered by (year, title), after the given cursor."""
+
+    # ACTED_IN
+    @abstractmethod
+    def link(self, actor_name, movie_title):
+        """Merge an ACTED_IN relationship; returns (actor_found, movie_found)."""
+
+    @abstractmethod
+    def ingest_actor(self, actor_data):
+        """Merge an actor with its `filmography` list of movies, as fetched from TMDB."""
+
+    # Reads
+    @abstractmethod
+    def search(self, search_type, query, limit=SEARCH_LIMIT):
+        """Case-insensitive substring search: exact, then prefix, then other matches."""
+
+    @abstractmethod
+    def autocomplete(self, search_type, query, limit=AUTOCOMPLETE_LIMIT):
+        pass
+
+    @abstractmethod
+    def filmography(self, name, year_from=None, year_to=None, after_year=None, after_title=None, limit=None):
+        """
+        Return (actor, movies) newest first, undated movies last, or None if the
+        actor is missing. The cursor is the (year or 0, title) of the last movie seen.
+        """
+
+    @abstractmethod
+    def cast(self, title):
+        """Return (movie, actors) ordered by name, or None if the movie is missing."""
+
+    def invalidate(self, event):
+        """Forget anything cached about the nodes a change feed event touched."""
+
+
+class Neo4jRepository(GraphRepository):
+    def __init__(self, graph):
+        self.graph = graph
+        self.matcher = NodeMatcher(graph)
+
+    def _run(self, name, **params):
+        return registry.run(self.graph, name, **params)
+
+    @contextmanager
+    def _transaction(self):
+        # A write and its catalog counter updates commit or roll back together;
+        # the stats helpers only call run(), so they take the transaction as the graph
+        tx = self.graph.begin()
+        try:
+            yield tx
+        except BaseException:
+            self.graph.rollback(tx)
+            raise
+        self.graph.commit(tx)
+
+    @staticmethod
+    def _timed(operation, call, *args, **kwargs):
+        # py2neo's own Cypher bypasses the query registry, so time it here
+        with span("cypher", query=operation):
+            return call(*args, **kwargs)
+
+    def _actor_node(self, name):
+        return self._timed("match:Actor", lambda: self.matcher.match("Actor", name=name).first())
+
+    def _movie_node(self, title):
+        return self._timed("match:Movie", lambda: self.matcher.match("Movie", title=title).first())
+
+    def get_actor(self, name):
+        node = self._actor_node(name)
+        return dict(node) if node else None
+
+    def list_actors(self):
+        return self._timed("match:Actor", lambda: [dict(node) for node in self.matcher.match("Actor")])
+
+    def create_actor(self, actor):
+        with self._transaction() as tx:
+            self._timed("create:Actor", tx.create, Node("Actor", movie_count=0, **actor))
+            stats.record_catalog_delta(tx, actors=1, deceased=int(stats.is_deceased(actor)))
+
+    def update_actor(self, name, changes):
+        node = self._actor_node(name)
+        if not node:
+            return None
+        was_deceased = stats.is_deceased(node)
+        node.update(**changes)
+        with self._transaction() as tx:
+            self._timed("push:Actor", tx.push, node)
+            stats.record_catalog_delta(tx, deceased=int(stats.is_deceased(node)) - int(was_deceased))
+        return dict(node)
+
+    def delete_actor(self, name):
+        node = self._actor_node(name)
+        if not node:
+            return None
+        with self._transaction() as tx:
+            titles = stats.linked_titles(tx, name)
+            self._timed("delete:Actor", tx.delete, node)
+            stats.refresh_degrees(tx, movie_titles=titles)
+            stats.record_catalog_delta(tx, actors=-1, deceased=-int(stats.is_deceased(node)))
+        return titles
+
+    def get_movie(self, title):
+        node = self._movie_node(title)
+        return dict(node) if node else None
+
+    def list_movies(self):
+        return self._timed("match:Movie", lambda: [dict(node) for node in self.matcher.match("Movie")])
+
+    def create_movie(self, movie):
+        with self._transaction() as tx:
+            self._timed("create:Movie", tx.create, Node("Movie", cast_size=0, **movie))
+            stats.record_catalog_delta(tx, movies=1)
+            stats.record_year_deltas(tx, {movie.get("year"): 1})
+
+    def update_movie(self, title, changes):
+        node = self._movie_node(title)
+        if not node:
+            return None
+        old_year = node.get("year")
+        node.update(**changes)
+        with self._transaction() as tx:
+            self._timed("push:Movie", tx.push, node)
+            if old_year != node.get("year"):
+                stats.record_year_deltas(tx, {old_year: -1, node.get("year"): 1})
+        return dict(node)
+
+    def delete_movie(self, title):
+        node = self._movie_node(title)
+        if not node:
+            return None
+        with self._transaction() as tx:
+            names = stats.linked_names(tx, title)
+            self._timed("delete:Movie", tx.delete, node)
+            stats.refresh_degrees(tx, actor_names=names)
+            stats.record_catalog_delta(tx, movies=-1)
+            stats.record_year_deltas(tx, {node.get("year"): -1})
+        return names
+
+    def movies_by_year(self, lower, upper, after_year=None, after_title=None, limit=100):
+        results = self._run("movies.by_year",
+                            lower=lower, upper=upper,
+                            after_year=after_year, after_title=after_title,
+                            fetch=limit).data()
+        return [dict(result["m"]) for result in results]
+
+    def link(self, actor_name, movie_title):
+        actor_node = self._actor_node(actor_name)
+        movie_node = self._movie_node(movie_title)
+        if actor_node and movie_node:
+            with self._transaction() as tx:
+                self._timed("merge:ACTED_IN", tx.merge, Relationship(actor_node, "ACTED_IN", movie_node))
+                stats.refresh_degrees(tx, actor_names=[actor_name], movie_titles=[movie_title])
+        return actor_node is not None, movie_node is not None
+
+    def ingest_actor(self, actor_data):
+        # Snapshot what already exists so the catalog counters can be adjusted
+        existing_actor = self._actor_node(actor_data['name'])
+        titles = {movie['title'] for movie in actor_data['filmography']}
+
+        with self._transaction() as tx:
+            existing_years = stats.movie_years(tx, titles)
+
+            actor_node = Node("Actor",
+                              name=actor_data['name'],
+                              date_of_birth=actor_data['date_of_birth'],
+                              gender=actor_data['gender'],
+                              date_of_death=actor_data['date_of_death'],
+                              profile_path=actor_data['profile_path'])
+            self._timed("merge:Actor", tx.merge, actor_node, "Actor", "name")
+
+            for movie in actor_data['filmography']:
+                movie_node = Node("Movie", title=movie['title'], year=movie['year'],
+                                  release_date=movie.get('release_date'))
+                self._timed("merge:Movie", tx.merge, movie_node, "Movie", "title")
+                self._timed("merge:ACTED_IN", tx.merge, Relationship(actor_node, "ACTED_IN", movie_node))
+
+            year_deltas = {}
+            new_movies = 0
+            for movie_title, year in {movie['title']: movie['year'] for movie in actor_data['filmography']}.items():
+                if movie_title not in existing_years:
+                    new_movies += 1
+                elif existing_years[movie_title] != year:
+                    old_year = existing_years[movie_title]
+                    year_deltas[old_year] = year_deltas.get(old_year, 0) - 1
+                else:
+                    continue
+                year_deltas[year] = year_deltas.get(year, 0) + 1
+
+            deceased = stats.is_deceased(actor_data)
+            if existing_actor:
+                stats.record_catalog_delta(tx, deceased=int(deceased) - int(stats.is_deceased(existing_actor)),
+                                           movies=new_movies)
+            else:
+                stats.record_catalog_delta(tx, actors=1, deceased=int(deceased), movies=new_movies)
+            stats.record_year_deltas(tx, year_deltas)
+            stats.refresh_degrees(tx, actor_names=[actor_data['name']], movie_titles=titles)
+        return sorted(titles)
+
+    def search(self, search_type, query, limit=SEARCH_LIMIT):
+        results = self._run(f"search.{search_type}", query=query).data()
+        return [dict(result['n']) for result in results[:limit]]
+
+    def autocomplete(self, search_type, query, limit=AUTOCOMPLETE_LIMIT):
+        results = self._run(f"autocomplete.{search_type}", query=query).data()
+        return [result['name'] for result in results[:limit]]
+
+    def filmography(self, name, year_from=None, year_to=None, after_year=None, after_title=None, limit=None):
+        result = self._run("actor.filmography",
+                           name=name,
+                           year_from=year_from, year_to=year_to,
+                           after_year=after_year, after_title=after_title,
+                           fetch=limit).data()
+        if not result or not result[0]['actor']:
+            return None
+        return dict(result[0]['actor']), [dict(movie) for movie in result[0]['movies']]
+
+    def cast(self, title):
+        # The APOC or plain variant is chosen once at startup by the query registry
+        result = self._run("movie.cast", title=title).data()
+        if not result or not result[0]['movie']:
+            return None
+        return dict(result[0]['movie']), [dict(actor) for actor in result[0]['actors'] if actor]
+
+
+class _NodeStore:
+    """
+    Array-backed node store for one label.
+
+    Each node has a slot: `props`, `keys` (the lower-cased key, scanned by
+    search) and `edges` (adjacency set of slots in the other store) are lists
+    indexed by it. `ids` maps a node's key to its slot; deleted slots are
+    reused.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.props = []
+        self.keys = []
+        self.edges = []
+        self.ids = {}
+        self._free = []
+
+    def __len__(self):
+        return len(self.ids)
+
+    def slot(self, key):
+        return self.ids.get(key)
+
+    def add(self, props):
+        key = props[self.key]
+        if self._free:
+            slot = self._free.pop()
+            self.props[slot], self.keys[slot], self.edges[slot] = props, key.lower(), set()
+        else:
+            slot = len(self.props)
+            self.props.append(props)
+            self.keys.append(key.lower())
+            self.edges.append(set())
+        self.ids[key] = slot
+        return slot
+
+    def rekey(self, slot, key):
+        del self.ids[self.props[slot][self.key]]
+        self.props[slot][self.key] = key
+        self.keys[slot] = key.lower()
+        self.ids[key] = slot
+
+    def remove(self, slot):
+        del self.ids[self.props[slot][self.key]]
+        self.props[slot] = self.keys[slot] = None
+        self.edges[slot] = set()
+        self._free.append(slot)
+
+    def nodes(self):
+        return [dict(props) for props in self.props if props is not None]
+
+    def search(self, query, limit):
+        """Slots matching like the search Cypher: exact, prefix, substring, then by key."""
+        needle = query.lower()
+        matches = []
+        for slot, key in enumerate(self.keys):
+            if key is None or needle not in key:
+                continue
+            relevance = 0 if key == needle else 1 if key.startswith(needle) else 2
+            matches.append((relevance, self.props[slot][self.key], slot))
+        matches.sort()
+        return [slot for _, _, slot in matches[:limit]]
+
+
+class InMemoryRepository(GraphRepository):
+    """
+    Indexed in-process graph engine.
+
+    Actors and movies live in array-backed node stores with a key -> slot index
+    and ACTED_IN adjacency sets in both directions, so lookups, filmography and
+    cast never scan. Dated movies are also kept in a sorted (year, title) list
+    for range scans. Search and autocomplete scan the lower-cased keys, as the
+    CONTAINS queries scan the label in Neo4j. Names and titles are unique keys,
+    so creating an existing node updates it. Not thread-safe; the API only
+    calls it from the event loop.
+    """
+
+    def __init__(self):
+        self.actors = _NodeStore("name")
+        self.movies = _NodeStore("title")
+        self._years = []
+
+    def node_count(self):
+        return len(self.actors) + len(self.movies)
+
+    def _index_year(self, props):
+        if props.get("year") is not None:
+            insort(self._years, (props["year"], props["title"]))
+
+    def _unindex_year(self, props):
+        if props.get("year") is None:
+            return
+        i = bisect_left(self._years, (props["year"], props["title"]))
+        if i < len(self._years) and self._years[i] == (props["year"], props["title"]):
+            del self._years[i]
+
+    def _merge(self, store, props):
+        """Insert or update a node, returning its slot."""
+        slot = store.slot(props[store.key])
+        if slot is None:
+            if store is self.movies:
+                self._index_year(props)
+            return store.add(dict(props))
+        if store is self.movies:
+            self._unindex_year(store.props[slot])
+            store.props[slot].update(props)
+            self._index_year(store.props[slot])
+        else:
+            store.props[slot].update(props)
+        return slot
+
+    def _update(self, store, key, changes):
+        slot = store.slot(key)
+        if slot is None:
+            return None
+        new_key = changes.get(store.key, key)
+        if new_key != key:
+            if store.slot(new_key) is not None:
+                raise ValueError(f"{new_key} already exists")
+            if store is self.movies:
+                self._unindex_year(store.props[slot])
+            store.rekey(slot, new_key)
+        elif store is self.movies:
+            self._unindex_year(store.props[slot])
+        store.props[slot].update(changes)
+        if store is self.movies:
+            self._index_year(store.props[slot])
+        return dict(store.props[slot])
+
+    def _delete(self, store, other, key):
+        slot = store.slot(key)
+        if slot is None:
+            return None
+        neighbours = store.edges[slot]
+        for neighbour in neighbours:
+            other.edges[neighbour].discard(slot)
+        linked = sorted(other.props[neighbour][other.key] for neighbour in neighbours)
+        if store is self.movies:
+            self._unindex_year(store.props[slot])
+        store.remove(slot)
+        return linked
+
+    def _link_slots(self, actor, movie):
+        self.actors.edges[actor].add(movie)
+        self.movies.edges[movie].add(actor)
+
+    def get_actor(self, name):
+        slot = self.actors.slot(name)
+        return dict(self.actors.props[slot]) if slot is not None else None
+
+    def list_actors(self):
+        return self.actors.nodes()
+
+    def create_actor(self, actor):
+        self._merge(self.actors, actor)
+
+    def update_actor(self, name, changes):
+        return self._update(self.actors, name, changes)
+
+    def delete_actor(self, name):
+        return self._delete(self.actors, self.movies, name)
+
+    def get_movie(self, title):
+        slot = self.movies.slot(title)
+        return dict(self.movies.props[slot]) if slot is not None else None
+
+    def list_movies(self):
+        return self.movies.nodes()
+
+    def create_movie(self, movie):
+        self._merge(self.movies, movie)
+
+    def update_movie(self, title, changes):
+        return self._update(self.movies, title, changes)
+
+    def delete_movie(self, title):
+        return self._delete(self.movies, self.actors, title)
+
+    def movies_by_year(self, lower, upper, after_year=None, after_title=None, limit=100):
+        start = bisect_left(self._years, (lower,))
+        if after_year is not None:
+            start = max(start, bisect_right(self._years, (after_year, after_title)))
+        movies = []
+        for year, title in self._years[start:start + limit]:
+            if year > upper:
+                break
+            movies.append(self.get_movie(title))
+        return movies
+
+    def link(self, actor_name, movie_title):
+        actor = self.actors.slot(actor_name)
+        movie = self.movies.slot(movie_title)
+        if actor is not None and movie is not None:
+            self._link_slots(actor, movie)
+        return actor is not None, movie is not None
+
+    def ingest_actor(self, actor_data):
+        actor = self._merge(self.actors, {key: actor_data.get(key) for key in
+                                          ("name", "date_of_birth", "gender", "date_of_death", "profile_path")})
+        for movie in actor_data['filmography']:
+            slot = self._merge(self.movies, {"title": movie['title'], "year": movie['year'],
+                                             "release_date": movie.get('release_date')})
+            self._link_slots(actor, slot)
+        return sorted({movie['title'] for movie in actor_data['filmography']})
+
+    def import_rows(self, rows):
+        """Merge rows in the bulk import layout (see bulk_import.py), like the import.rows query."""
+        for row in rows:
+            actor = self._merge(self.actors, {"name": row["name"]})
+            props = self.actors.props[actor]
+            for field in ("date_of_birth", "gender", "date_of_death"):
+                if row.get(field) is not None:
+                    props[field] = row[field]
+            if row.get("movie_title") is None:
+                continue
+            movie = self.movies.slot(row["movie_title"])
+            if movie is None:
+                movie = self._merge(self.movies, {"title": row["movie_title"], "year": row.get("year")})
+            elif self.movies.props[movie].get("year") is None and row.get("year") is not None:
+                self._merge(self.movies, {"title": row["movie_title"], "year": row["year"]})
+            self._link_slots(actor, movie)
+
+    def search(self, search_type, query, limit=SEARCH_LIMIT):
+        store = self.actors if search_type == "actor" else self.movies
+        return [dict(store.props[slot]) for slot in store.search(query, limit)]
+
+    def autocomplete(self, search_type, query, limit=AUTOCOMPLETE_LIMIT):
+        store = self.actors if search_type == "actor" else self.movies
+        return [store.props[slot][store.key] for slot in store.search(query, limit)]
+
+    def filmography(self, name, year_from=None, year_to=None, after_year=None, after_title=None, limit=None):
+        actor = self.actors.slot(name)
+        if actor is None:
+            return None
+        movies = []
+        for slot in self.actors.edges[actor]:
+            movie = self.movies.props[slot]
+            year = movie.get("year")
+            # A year filter excludes undated movies, as comparisons with null do in Cypher
+            if year_from is not None and (year is None or year < year_from):
+                continue
+            if year_to is not None and (year is None or year > year_to):
+                continue
+            sort_year = year or 0
+            if after_year is not None and not (sort_year < after_year or
+                                               (sort_year == after_year and movie["title"] > after_title)):
+                continue
+            movies.append(movie)
+        movies.sort(key=lambda movie: (-(movie.get("year") or 0), movie["title"]))
+        if limit is not None:
+            movies = movies[:limit]
+        return dict(self.actors.props[actor]), [dict(movie) for movie in movies]
+
+    def cast(self, title):
+        movie = self.movies.slot(title)
+        if movie is None:
+            return None
+        actors = sorted((self.actors.props[slot] for slot in self.movies.edges[movie]),
+                        key=lambda actor: actor["name"])
+        return dict(self.movies.props[movie]), [dict(actor) for actor in actors]
+
+    def load(self, path, format="csv"):
+        """Load a file in the bulk import layout; returns (rows loaded, rows skipped)."""
+        from bulk_import import read_records, normalise, RowError
+
+        loaded = skipped = 0
+        with open(path, "r", encoding="utf-8-sig", newline="") as file:
+            for _, record, error in read_records(file, format):
+                try:
+                    if error is not None:
+                        raise RowError(error)
+                    self.import_rows([normalise(record)])
+                    loaded += 1
+                except RowError:
+                    skipped += 1
+        return loaded, skipped
+
+
+class ReadThroughRepository(GraphRepository):
+    """
+    A backend with hot lookups cached in an InMemoryRepository.
+
+    Actor and movie lookups, filmographies and casts are served from the cache
+    once fetched; a filmography or cast is only answered locally after the
+    whole list has been loaded from the backend, and filters and pagination
+    then run in memory. Listings and searches always go to the backend. Local
+    writes invalidate the nodes they touch. Writes from other workers arrive
+    through invalidate(), fed by the change feed, so they can be served stale
+    for up to one feed poll. The cache is dropped when it outgrows `max_nodes`.
+    """
+
+    def __init__(self, backend, max_nodes=100000):
+        self.backend = backend
+        self.max_nodes = max_nodes
+        self.hits = 0
+        self.misses = 0
+        self.clear()
+
+    def clear(self):
+        self.cache = InMemoryRepository()
+        self._filmographies = set()
+        self._casts = set()
+
+    def invalidate(self, event):
+        """Drop cached nodes touched by a change feed event."""
+        data = event.get("data") or {}
+        if event["type"] == "actor":
+            self._invalidate_actor(event["key"])
+            for title in data.get("movies") or ():
+                self._invalidate_movie(title)
+        elif event["type"] == "movie":
+            self._invalidate_movie(event["key"])
+            for name in data.get("actors") or ():
+                self._invalidate_actor(name)
+        elif event["type"] == "acted_in":
+            self._invalidate_actor(event["key"])
+            self._invalidate_movie(data.get("movie"))
+        else:
+            self.clear()
+
+    def _invalidate_actor(self, name):
+        self._filmographies.discard(name)
+        for title in self.cache.delete_actor(name) or ():
+            self._casts.discard(title)
+
+    def _invalidate_movie(self, title):
+        self._casts.discard(title)
+        for name in self.cache.delete_movie(title) or ():
+            self._filmographies.discard(name)
+
+    def _record(self, hit):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def _fill(self, actors, movies, links):
+        if self.cache.node_count() + len(actors) + len(movies) > self.max_nodes:
+            self.clear()
+        for actor in actors:
+            self.cache.create_actor(actor)
+        for movie in movies:
+            self.cache.create_movie(movie)
+        for name, title in links:
+            self.cache.link(name, title)
+
+    def get_actor(self, name):
+        actor = self.cache.get_actor(name)
+        self._record(actor is not None)
+        if actor is None:
+            actor = self.backend.get_actor(name)
+            if actor is not None:
+                self._fill([actor], [], [])
+        return actor
+
+    def get_movie(self, title):
+        movie = self.cache.get_movie(title)
+        self._record(movie is not None)
+        if movie is None:
+            movie = self.backend.get_movie(title)
+            if movie is not None:
+                self._fill([], [movie], [])
+        return movie
+
+    def filmography(self, name, year_from=None, year_to=None, after_year=None, after_title=None, limit=None):
+        self._record(name in self._filmographies)
+        if name not in self._filmographies:
+            result = self.backend.filmography(name)
+            if result is None:
+                return None
+            actor, movies = result
+            self._fill([actor], movies, [(name, movie["title"]) for movie in movies])
+            self._filmographies.add(name)
+        return self.cache.filmography(name, year_from, year_to, after_year, after_title, limit)
+
+    def cast(self, title):
+        self._record(title in self._casts)
+        if title not in self._casts:
+            result = self.backend.cast(title)
+            if result is None:
+                return None
+            movie, actors = result
+            self._fill(actors, [movie], [(actor["name"], title) for actor in actors])
+            self._casts.add(title)
+        return self.cache.cast(title)
+
+    def list_actors(self):
+        return self.backend.list_actors()
+
+    def list_movies(self):
+        return self.backend.list_movies()
+
+    def movies_by_year(self, lower, upper, after_year=None, after_title=None, limit=100):
+        return self.backend.movies_by_year(lower, upper, after_year, after_title, limit)
+
+    def search(self, search_type, query, limit=SEARCH_LIMIT):
+        return self.backend.search(search_type, query, limit)
+
+    def autocomplete(self, search_type, query, limit=AUTOCOMPLETE_LIMIT):
+        return self.backend.autocomplete(search_type, query, limit)
+
+    def create_actor(self, actor):
+        self.backend.create_actor(actor)
+        self._invalidate_actor(actor["name"])
+
+    def update_actor(self, name, changes):
+        self._invalidate_actor(name)
+        return self.backend.update_actor(name, changes)
+
+    def delete_actor(self, name):
+        self._invalidate_actor(name)
+        return self.backend.delete_actor(name)
+
+    def create_movie(self, movie):
+        self.backend.create_movie(movie)
+        self._invalidate_movie(movie["title"])
+
+    def update_movie(self, title, changes):
+        self._invalidate_movie(title)
+        return self.backend.update_movie(title, changes)
+
+    def delete_movie(self, title):
+        self._invalidate_movie(title)
+        return self.backend.delete_movie(title)
+
+    def link(self, actor_name, movie_title):
+        self._invalidate_actor(actor_name)
+        self._invalidate_movie(movie_title)
+        return self.backend.link(actor_name, movie_title)
+
+    def ingest_actor(self, actor_data):
+        titles = self.backend.ingest_actor(actor_data)
+        self._invalidate_actor(actor_data["name"])
+        for title in titles:
+            self._invalidate_movie(title)
+        return titles
+
+
+if __name__ == "__main__":
+    # Offline baseline: python repository.py <actors_movies_tmdb.csv>
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(
+        os.path.dirname(__file__), "..", "Scrapers & Migration Scripts", "actors_movies_tmdb.csv")
+
+    repo = InMemoryRepository()
+    start = time.perf_counter()
+    loaded, skipped = repo.load(path)
+    logging.info(f"Loaded {loaded} rows ({skipped} skipped) into {len(repo.actors)} actors and "
+                 f"{len(repo.movies)} movies in {time.perf_counter() - start:.3f}s")
+
+    names = [actor["name"] for actor in repo.list_actors()]
+    titles = [movie["title"] for movie in repo.list_movies()]
+    for label, keys, call in (("get_actor", names, repo.get_actor),
+                              ("filmography", names, repo.filmography),
+                              ("cast", titles, repo.cast),
+                              ("search", [name[:3] for name in names], lambda q: repo.search("actor", q))):
+        start = time.perf_counter()
+        for key in keys:
+            call(key)
+        elapsed = time.perf_counter() - start
+        logging.info(f"{label}: {len(keys)} calls, {elapsed / max(len(keys), 1) * 1e6:.1f}us per call")
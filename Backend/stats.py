@@ -0,0 +1,118 @@
+import os
+import logging
+from queries import registry
+
+# Precomputed catalog statistics.
+#
+# Actor.movie_count and Movie.cast_size hold ACTED_IN degrees, a single
+# (:CatalogStats {id: 'catalog'}) node holds totals, and (:YearStats {year})
+# nodes hold the films-per-year histogram. Mutating endpoints keep them
+# up to date incrementally, in the same transaction as the write they count;
+# backfill() recomputes everything from scratch.
+# The Cypher lives in queries.py under the "stats." prefix.
+
+STATS_INDEXES = [
+    "CREATE INDEX actor_movie_count IF NOT EXISTS FOR (a:Actor) ON (a.movie_count)",
+    "CREATE INDEX movie_cast_size IF NOT EXISTS FOR (m:Movie) ON (m.cast_size)",
+    # Superseded by the year_stats_year_unique constraint below
+    "DROP INDEX year_stats_year IF EXISTS",
+]
+
+# The counter nodes are MERGEd by concurrent transactions, which only yields a
+# single node per key under a uniqueness constraint. Created once migrations
+# have removed any duplicates.
+STATS_CONSTRAINTS = [
+    "CREATE CONSTRAINT year_stats_year_unique IF NOT EXISTS FOR (y:YearStats) REQUIRE y.year IS UNIQUE",
+    "CREATE CONSTRAINT catalog_stats_id_unique IF NOT EXISTS FOR (s:CatalogStats) REQUIRE s.id IS UNIQUE",
+]
+
+
+def is_deceased(actor):
+    return bool(actor.get("date_of_death"))
+
+
+def record_catalog_delta(graph, actors=0, deceased=0, movies=0):
+    if actors or deceased or movies:
+        registry.run(graph, "stats.catalog_delta", actors=actors, deceased=deceased, movies=movies)
+
+
+def record_year_deltas(graph, deltas):
+    """Apply {year: change} deltas to the films-per-year histogram."""
+    deltas = [{"year": year, "count": count} for year, count in deltas.items()
+              if year is not None and count]
+    if deltas:
+        registry.run(graph, "stats.year_delta", deltas=deltas)
+
+
+def refresh_degrees(graph, actor_names=(), movie_titles=()):
+    """Recount ACTED_IN degrees for the given nodes only."""
+    if actor_names:
+        registry.run(graph, "stats.refresh_actor_degrees", names=list(actor_names))
+    if movie_titles:
+        registry.run(graph, "stats.refresh_movie_degrees", titles=list(movie_titles))
+
+
+def movie_years(graph, titles):
+    """Return {title: year} for the titles that already exist."""
+    if not titles:
+        return {}
+    return {row["title"]: row["year"] for row in registry.run(graph, "stats.movie_years", titles=list(titles)).data()}
+
+
+def linked_names(graph, title):
+    return [row["name"] for row in registry.run(graph, "stats.linked_names", title=title).data()]
+
+
+def linked_titles(graph, name):
+    return [row["title"] for row in registry.run(graph, "stats.linked_titles", name=name).data()]
+
+
+BACKFILL_QUERIES = [
+    "stats.backfill_actor_degrees",
+    "stats.backfill_movie_degrees",
+    "stats.backfill_years",
+    "stats.backfill_catalog",
+]
+
+
+def backfill(graph):
+    for name in BACKFILL_QUERIES:
+        registry.run(graph, name)
+    logging.info("Catalog statistics backfilled")
+
+
+def read_stats(graph):
+    catalog = registry.run(graph, "stats.catalog").evaluate() or {}
+    actors = catalog.get("actor_count", 0)
+    deceased = catalog.get("deceased_count", 0)
+    return {
+        "actors": {
+            "total": actors,
+            "active": actors - deceased,
+            "deceased": deceased
+        },
+        "movies": {
+            "total": catalog.get("movie_count", 0)
+        },
+        "films_per_year": registry.run(graph, "stats.films_per_year").data()
+    }
+
+
+def read_top_actors(graph, limit):
+    return registry.run(graph, "stats.top_actors", limit=limit).data()
+
+
+def read_top_movies(graph, limit):
+    return registry.run(graph, "stats.top_movies", limit=limit).data()
+
+
+if __name__ == "__main__":
+    # Backfill job: python stats.py
+    from py2neo import Graph
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    db = Graph(os.getenv("NEO4J_URI", "bolt://localhost:7687"),
+               auth=(os.getenv("NEO4J_USER", "neo4j"), os.getenv("NEO4J_PASSWORD", "password")),
+               name="neo4j")
+    registry.probe(db)
+    backfill(db)
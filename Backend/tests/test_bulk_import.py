@@ -0,0 +1,114 @@
+import asyncio
+import threading
+import pytest
+import stats
+from bulk_import import ImportBusyError, ImportManager, MultipartFile, UploadError
+from change_feed import ChangeFeed
+
+BOUNDARY = "x-boundary"
+CONTENT_TYPE = f"multipart/form-data; boundary={BOUNDARY}"
+
+
+def body(*parts):
+    data = b""
+    for disposition, content in parts:
+        data += (f"--{BOUNDARY}\r\nContent-Disposition: form-data; {disposition}\r\n"
+                 f"Content-Type: text/csv\r\n\r\n").encode() + content + b"\r\n"
+    return data + f"--{BOUNDARY}--\r\n".encode()
+
+
+def test_file_field_is_extracted_across_chunk_boundaries():
+    csv = "Name,Movie Title\nZoë Kravitz,Big Little Lies\n".encode()
+    data = body(('name="note"', b"ignored"),
+                ('name="file"; filename="cast.csv"', csv))
+    upload = MultipartFile(CONTENT_TYPE)
+    received = b""
+    for i in range(0, len(data), 7):
+        upload.feed(data[i:i + 7])
+        received += upload.drain()
+    received += upload.finish()
+
+    assert received == csv
+    assert (upload.filename, upload.content_type) == ("cast.csv", "text/csv")
+
+
+def test_missing_file_field_is_rejected():
+    upload = MultipartFile(CONTENT_TYPE)
+    upload.feed(body(('name="note"', b"no file here")))
+    with pytest.raises(UploadError):
+        upload.finish()
+
+
+def test_non_multipart_body_is_rejected():
+    with pytest.raises(UploadError):
+        MultipartFile("text/csv")
+
+
+class FakeTx:
+    def run(self, cypher, **params):
+        self.rows = params["rows"]
+
+
+class FakeGraph:
+    def __init__(self):
+        self.written = []
+        self.committed = threading.Event()
+
+    def begin(self):
+        return FakeTx()
+
+    def commit(self, tx):
+        self.written.extend(row["name"] for row in tx.rows)
+        self.committed.set()
+
+    def rollback(self, tx):
+        pass
+
+
+def csv_upload(lines):
+    return body(('name="file"; filename="cast.csv"', "".join(lines).encode()))
+
+
+def test_records_are_written_while_the_upload_streams_in(monkeypatch):
+    monkeypatch.setattr(stats, "backfill", lambda graph: None)
+    graph = FakeGraph()
+    data = csv_upload(["Name,Movie Title\n"] + [f"Actor {i},Movie {i}\n" for i in range(5)])
+    # Cut after the third record, before the rest of the file has been sent
+    cut = data.index(b"Actor 3")
+
+    async def request_body():
+        yield data[:cut]
+        # The first batch lands before the body goes on
+        assert await asyncio.to_thread(graph.committed.wait, 2)
+        yield data[cut:]
+
+    async def main():
+        importer = ImportManager(ChangeFeed(), batch_size=2)
+        job = await importer.submit(graph, CONTENT_TYPE, request_body())
+        await asyncio.gather(*importer._tasks)
+        return job
+
+    job = asyncio.run(main())
+    assert job.status == "completed" and job.rows_written == 5
+    assert graph.written == [f"Actor {i}" for i in range(5)]
+
+
+def test_second_upload_is_turned_away_while_one_is_importing(monkeypatch):
+    monkeypatch.setattr(stats, "backfill", lambda graph: None)
+    release = asyncio.Event()
+
+    async def slow_body():
+        yield csv_upload(["Name,Movie Title\n"])[:60]
+        await release.wait()
+
+    async def main():
+        importer = ImportManager(ChangeFeed())
+        first = asyncio.create_task(importer.submit(FakeGraph(), CONTENT_TYPE, slow_body()))
+        await asyncio.sleep(0.05)
+        with pytest.raises(ImportBusyError):
+            await importer.submit(FakeGraph(), CONTENT_TYPE, slow_body())
+        first.cancel()
+        await asyncio.gather(first, return_exceptions=True)
+        await importer.stop()
+
+    asyncio.run(main())
@@ -0,0 +1,115 @@
+import os
+import time
+from catalog_snapshot import build_snapshot, CatalogSnapshot, SnapshotStore, CURRENT_FILE
+from repository import InMemoryRepository
+
+
+def publish(directory, actor_names, movies, edges=(), graph_version=0):
+    movies = [{"title": movie} if isinstance(movie, str) else movie for movie in movies]
+    version, data = build_snapshot(actor_names, movies, edges, graph_version)
+    filename = f"catalog-{version}.snap"
+    with open(os.path.join(directory, filename), "wb") as file:
+        file.write(data)
+    with open(os.path.join(directory, CURRENT_FILE), "w") as file:
+        file.write(filename)
+    return os.path.join(directory, filename)
+
+
+def test_autocomplete_ranks_exact_then_prefix_then_substring(tmp_path):
+    path = publish(tmp_path, ["Tom", "Tom Hanks", "Atomic Tom", "Meryl Streep"], ["Big"])
+    snapshot = CatalogSnapshot(path)
+    assert snapshot.autocomplete("actor", "tom") == ["Tom", "Tom Hanks", "Atomic Tom"]
+    assert snapshot.autocomplete("actor", "tom", limit=1) == ["Tom"]
+    assert snapshot.autocomplete("movie", "BIG") == ["Big"]
+    assert snapshot.autocomplete("movie", "") == []
+
+
+def test_non_latin1_titles_round_trip(tmp_path):
+    snapshot = CatalogSnapshot(publish(tmp_path, ["Émile Hirsch"], ["Making “Room”"]))
+    assert snapshot.autocomplete("movie", "“room”") == ["Making “Room”"]
+    assert snapshot.autocomplete("actor", "émile") == ["Émile Hirsch"]
+
+
+def test_store_goes_stale_on_catalog_changes_only(tmp_path):
+    publish(tmp_path, ["Tom Hanks"], ["Big"], graph_version=5)
+    store = SnapshotStore(str(tmp_path))
+    store.refresh()
+    assert store.usable() is store.current
+
+    store.on_change({"type": "acted_in", "version": 6})
+    assert store.usable() is not None
+    store.on_change({"type": "actor", "version": 5})
+    assert store.usable() is not None
+    store.on_change({"type": "movie", "version": 7})
+    assert store.usable() is None
+
+
+def test_new_export_replaces_stale_snapshot(tmp_path):
+    publish(tmp_path, ["Tom Hanks"], ["Big"], graph_version=5)
+    store = SnapshotStore(str(tmp_path))
+    store.refresh()
+    store.on_change({"type": "actor", "version": 6})
+    assert store.usable() is None
+
+    os.remove(os.path.join(tmp_path, CURRENT_FILE))
+    store.refresh()
+    assert store.usable() is None
+
+    # Snapshot files are named after their millisecond timestamp
+    time.sleep(0.002)
+    publish(tmp_path, ["Tom Hanks", "Tom Holland"], ["Big"], graph_version=6)
+    store.refresh()
+    assert store.usable().autocomplete("actor", "tom") == ["Tom Hanks", "Tom Holland"]
+
+
+ROWS = [
+    {"name": "Tom Hanks", "movie_title": "Big", "year": 1988},
+    {"name": "Tom Hanks", "movie_title": "Cast Away", "year": 2000},
+    {"name": "Tom Hanks", "movie_title": "Splash", "year": 1984},
+    {"name": "Tom Hanks", "movie_title": "Untitled Project", "year": None},
+    {"name": "Tom Hanks", "movie_title": "Turner & Hooch", "year": 1989},
+    {"name": "Elizabeth Perkins", "movie_title": "Big", "year": 1988},
+    {"name": "Meryl Streep", "movie_title": None},
+]
+
+
+def catalog_snapshot(tmp_path):
+    repo = InMemoryRepository()
+    repo.import_rows(ROWS)
+    repo.update_movie("Big", {"release_date": "1988-06-03"})
+    edges = [(row["name"], row["movie_title"]) for row in ROWS if row["movie_title"]]
+    actors = [actor["name"] for actor in repo.list_actors()]
+    return repo, CatalogSnapshot(publish(tmp_path, actors, repo.list_movies(), edges))
+
+
+def test_filmography_matches_the_repository(tmp_path):
+    repo, snapshot = catalog_snapshot(tmp_path)
+    for filters in ({}, {"limit": 2}, {"after_year": 1988, "after_title": "Big"},
+                    {"after_year": 0, "after_title": "Untitled Project"},
+                    {"year_from": 1985, "year_to": 1995}, {"year_from": 1985, "limit": 1}):
+        _, movies = repo.filmography("Tom Hanks", **filters)
+        expected = [{"title": m["title"], "year": m.get("year"), "release_date": m.get("release_date")}
+                    for m in movies]
+        assert snapshot.filmography("Tom Hanks", **filters) == expected, filters
+    assert snapshot.filmography("Meryl Streep") == []
+    assert snapshot.filmography("Nobody") is None
+
+
+def test_cast_lists_actors_in_name_order(tmp_path):
+    _, snapshot = catalog_snapshot(tmp_path)
+    movie, names = snapshot.cast("Big")
+    assert movie == {"title": "Big", "year": 1988, "release_date": "1988-06-03"}
+    assert names == ["Elizabeth Perkins", "Tom Hanks"]
+    assert snapshot.cast("Untitled Project")[0]["year"] is None
+    assert snapshot.cast("Missing") is None
+
+
+def test_link_changes_only_retire_the_adjacency(tmp_path):
+    publish(tmp_path, ["Tom Hanks"], ["Big"], [("Tom Hanks", "Big")], graph_version=5)
+    store = SnapshotStore(str(tmp_path))
+    store.refresh()
+    assert store.usable(links=True) is not None
+
+    store.on_change({"type": "acted_in", "version": 6})
+    assert store.usable(links=True) is None
+    assert store.usable() is not None
@@ -0,0 +1,76 @@
+import asyncio
+import threading
+from change_feed import ChangeFeed
+from queries import registry
+
+
+class FakeCursor:
+    def __init__(self, value=None):
+        self.value = value
+
+    def evaluate(self, field=0):
+        return self.value
+
+    def data(self, *keys):
+        return []
+
+
+class FakeGraph:
+    """Answers the change feed queries, holding the version back until released."""
+
+    def __init__(self, version):
+        self.version = version
+        self.published = []
+        self.release = None
+
+    def run(self, cypher, **params):
+        if cypher == registry.cypher("changes.version"):
+            self.release.wait(2)
+            return FakeCursor(self.version)
+        if cypher == registry.cypher("changes.publish"):
+            self.published.extend(params["events"])
+        return FakeCursor()
+
+
+class FakeRequest:
+    async def is_disconnected(self):
+        return False
+
+
+def test_close_flushes_events_published_after_the_feed_stopped():
+    async def main():
+        graph = FakeGraph(3)
+        graph.release = threading.Event()
+        graph.release.set()
+        feed = ChangeFeed(poll_interval=60)
+        task = asyncio.create_task(feed.run(graph))
+        await asyncio.sleep(0.05)
+
+        feed.publish("catalog", "imported", "job-1", rows=10)
+        await feed.close()
+        task.cancel()
+        return graph.published
+
+    published = asyncio.run(main())
+    assert [event["key"] for event in published] == ["job-1"]
+
+
+def test_stream_waits_for_the_version_before_answering_a_resume():
+    async def main():
+        graph = FakeGraph(7)
+        graph.release = threading.Event()
+        feed = ChangeFeed(poll_interval=60)
+        task = asyncio.create_task(feed.run(graph))
+
+        stream = feed.stream(5, FakeRequest(), heartbeat=0.01)
+        assert await stream.__anext__() == "retry: 3000\n\n"
+        assert await stream.__anext__() == ": keep-alive\n\n"
+        graph.release.set()
+        # Within the known history, so no reset
+        first = await asyncio.wait_for(stream.__anext__(), 1)
+        await stream.aclose()
+        task.cancel()
+        return first
+
+    first = asyncio.run(main())
+    assert "event: reset" not in first
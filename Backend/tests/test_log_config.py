@@ -0,0 +1,17 @@
+import json
+import logging
+from log_config import setup_logging, shutdown_logging
+
+
+def test_logging_restarts_after_shutdown(tmp_path):
+    path = tmp_path / "api.jsonl"
+    root = logging.getLogger()
+    handlers = list(root.handlers)
+    for run in range(2):
+        setup_logging(str(path))
+        logging.warning(f"run {run}")
+        shutdown_logging()
+        assert root.handlers == handlers
+
+    messages = [json.loads(line)["message"] for line in path.read_text().splitlines()]
+    assert messages == ["run 0", "run 1"]
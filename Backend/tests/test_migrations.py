@@ -0,0 +1,58 @@
+import threading
+import migrations
+from migrations import MIGRATIONS, run_migrations
+from queries import registry
+
+
+class FakeCursor:
+    def __init__(self, value=None, rows=()):
+        self.value = value
+        self.rows = list(rows)
+
+    def evaluate(self, field=0):
+        return self.value
+
+    def data(self, *keys):
+        return self.rows
+
+
+class FakeGraph:
+    """Keeps the lock node and migration records the way the Cypher would."""
+
+    def __init__(self):
+        self.mutex = threading.Lock()
+        self.owner = None
+        self.applied = set()
+        self.steps = []
+
+    def run(self, cypher, **params):
+        with self.mutex:
+            if cypher == registry.cypher("migrate.lock"):
+                if self.owner in (None, params["owner"]):
+                    self.owner = params["owner"]
+                    return FakeCursor(self.owner)
+                return FakeCursor()
+            if cypher == registry.cypher("migrate.unlock"):
+                if self.owner == params["owner"]:
+                    self.owner = None
+            elif cypher == registry.cypher("migrate.applied"):
+                return FakeCursor(rows=[{"id": id} for id in self.applied])
+            elif cypher == registry.cypher("migrate.record"):
+                self.applied.add(params["id"])
+            elif cypher != migrations.LOCK_CONSTRAINT:
+                self.steps.append(cypher)
+        return FakeCursor()
+
+
+def test_concurrent_workers_apply_each_migration_once(monkeypatch):
+    monkeypatch.setattr(migrations, "LOCK_POLL_INTERVAL", 0.01)
+    graph = FakeGraph()
+    workers = [threading.Thread(target=run_migrations, args=(graph,)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert len(graph.steps) == sum(len(steps) for _, steps in MIGRATIONS)
+    assert graph.applied == {migration_id for migration_id, _ in MIGRATIONS}
+    assert graph.owner is None
@@ -0,0 +1,178 @@
+import pytest
+from queries import registry
+from repository import InMemoryRepository, Neo4jRepository, ReadThroughRepository
+
+
+def seeded():
+    repo = InMemoryRepository()
+    repo.import_rows([
+        {"name": "Tom Hanks", "gender": "Male", "movie_title": "Big", "year": 1988},
+        {"name": "Tom Hanks", "movie_title": "Cast Away", "year": 2000},
+        {"name": "Tom Hanks", "movie_title": "Splash", "year": 1984},
+        {"name": "Tom Hanks", "movie_title": "Untitled Project", "year": None},
+        {"name": "Elizabeth Perkins", "movie_title": "Big", "year": 1988},
+        {"name": "Tom", "movie_title": None},
+        {"name": "Atomic Tom", "movie_title": None},
+    ])
+    return repo
+
+
+def test_create_update_and_delete():
+    repo = InMemoryRepository()
+    repo.create_actor({"name": "Meryl Streep", "gender": "Female"})
+    repo.create_movie({"title": "Doubt", "year": 2008})
+    assert repo.link("Meryl Streep", "Doubt") == (True, True)
+    assert repo.link("Meryl Streep", "Missing") == (True, False)
+
+    assert repo.update_actor("Meryl Streep", {"gender": "F"})["gender"] == "F"
+    assert repo.update_actor("Nobody", {"gender": "F"}) is None
+    assert repo.delete_movie("Doubt") == ["Meryl Streep"]
+    assert repo.filmography("Meryl Streep") == ({"name": "Meryl Streep", "gender": "F"}, [])
+    assert repo.delete_actor("Meryl Streep") == []
+    assert repo.get_actor("Meryl Streep") is None
+    assert repo.delete_actor("Meryl Streep") is None
+
+
+def test_rename_keeps_links_and_year_index():
+    repo = seeded()
+    repo.update_movie("Big", {"title": "Big!", "year": 1989})
+    assert repo.get_movie("Big") is None
+    assert [movie["title"] for movie in repo.movies_by_year(1989, 1989)] == ["Big!"]
+    assert [actor["name"] for actor in repo.cast("Big!")[1]] == ["Elizabeth Perkins", "Tom Hanks"]
+    with pytest.raises(ValueError):
+        repo.update_movie("Big!", {"title": "Splash"})
+
+
+def test_search_ranks_exact_then_prefix_then_substring():
+    repo = seeded()
+    assert [actor["name"] for actor in repo.search("actor", "TOM")] == ["Tom", "Tom Hanks", "Atomic Tom"]
+    assert repo.autocomplete("actor", "tom", limit=2) == ["Tom", "Tom Hanks"]
+
+
+def test_filmography_orders_pages_and_filters():
+    repo = seeded()
+    _, movies = repo.filmography("Tom Hanks")
+    assert [movie["title"] for movie in movies] == ["Cast Away", "Big", "Splash", "Untitled Project"]
+
+    _, page = repo.filmography("Tom Hanks", after_year=1988, after_title="Big", limit=1)
+    assert [movie["title"] for movie in page] == ["Splash"]
+    # A cursor past the last movie is an empty page, not a missing actor
+    actor, page = repo.filmography("Tom Hanks", after_year=0, after_title="Untitled Project")
+    assert actor["name"] == "Tom Hanks" and page == []
+
+    _, movies = repo.filmography("Tom Hanks", year_from=1985, year_to=1995)
+    assert [movie["title"] for movie in movies] == ["Big"]
+    assert repo.filmography("Nobody") is None
+
+
+def test_movies_by_year_pages_with_cursor():
+    repo = seeded()
+    first = repo.movies_by_year(1900, 2100, limit=2)
+    assert [movie["title"] for movie in first] == ["Splash", "Big"]
+    last = first[-1]
+    rest = repo.movies_by_year(1900, 2100, after_year=last["year"], after_title=last["title"], limit=2)
+    assert [movie["title"] for movie in rest] == ["Cast Away"]
+
+
+class CountingRepository(InMemoryRepository):
+    def __init__(self):
+        super().__init__()
+        self.reads = 0
+
+    def get_actor(self, name):
+        self.reads += 1
+        return super().get_actor(name)
+
+    def filmography(self, *args, **kwargs):
+        self.reads += 1
+        return super().filmography(*args, **kwargs)
+
+
+def read_through():
+    backend = CountingRepository()
+    backend.import_rows([
+        {"name": "Tom Hanks", "movie_title": "Big", "year": 1988},
+        {"name": "Tom Hanks", "movie_title": "Splash", "year": 1984},
+    ])
+    return backend, ReadThroughRepository(backend)
+
+
+def test_read_through_serves_repeat_reads_from_cache():
+    backend, repo = read_through()
+    assert repo.get_actor("Tom Hanks")["name"] == "Tom Hanks"
+    assert repo.get_actor("Tom Hanks")["name"] == "Tom Hanks"
+    assert backend.reads == 1
+    assert (repo.hits, repo.misses) == (1, 1)
+
+    _, movies = repo.filmography("Tom Hanks", limit=1)
+    _, movies = repo.filmography("Tom Hanks", after_year=1988, after_title="Big")
+    assert [movie["title"] for movie in movies] == ["Splash"]
+    assert backend.reads == 2
+
+
+def test_read_through_drops_nodes_named_by_change_events():
+    backend, repo = read_through()
+    repo.filmography("Tom Hanks")
+
+    # A write that bypassed the cache, e.g. a batched write or another worker
+    backend.create_movie({"title": "Cast Away", "year": 2000})
+    backend.link("Tom Hanks", "Cast Away")
+    assert len(repo.filmography("Tom Hanks")[1]) == 2
+
+    repo.invalidate({"type": "acted_in", "key": "Tom Hanks", "data": {"movie": "Cast Away"}})
+    assert [movie["title"] for movie in repo.filmography("Tom Hanks")[1]] == ["Cast Away", "Big", "Splash"]
+
+
+def test_read_through_local_writes_invalidate():
+    backend, repo = read_through()
+    repo.get_actor("Tom Hanks")
+    repo.update_actor("Tom Hanks", {"gender": "Male"})
+    assert repo.get_actor("Tom Hanks")["gender"] == "Male"
+
+    repo.invalidate({"type": "catalog", "key": "import"})
+    assert repo.cache.node_count() == 0
+
+
+def test_invalidate_is_a_no_op_for_uncached_backends():
+    repo = seeded()
+    repo.invalidate({"type": "actor", "key": "Tom Hanks"})
+    assert repo.get_actor("Tom Hanks") is not None
+
+
+class FakeTx:
+    def __init__(self, fail_on):
+        self.fail_on = fail_on
+        self.created = []
+
+    def create(self, node):
+        self.created.append(node)
+
+    def run(self, cypher, **params):
+        if self.fail_on and cypher == registry.cypher(self.fail_on):
+            raise RuntimeError("connection reset")
+
+
+class FakeGraph:
+    def __init__(self, fail_on):
+        self.tx = FakeTx(fail_on)
+        self.outcome = None
+
+    def begin(self):
+        return self.tx
+
+    def commit(self, tx):
+        self.outcome = "committed"
+
+    def rollback(self, tx):
+        self.outcome = "rolled back"
+
+
+def test_neo4j_write_and_counters_share_a_transaction():
+    graph = FakeGraph(fail_on="stats.year_delta")
+    with pytest.raises(RuntimeError):
+        Neo4jRepository(graph).create_movie({"title": "Big", "year": 1988})
+    assert graph.tx.created and graph.outcome == "rolled back"
+
+    graph = FakeGraph(fail_on=None)
+    Neo4jRepository(graph).create_movie({"title": "Big", "year": 1988})
+    assert graph.outcome == "committed"
@@ -0,0 +1,176 @@
+import asyncio
+import httpx
+import pytest
+from tmdb_client import TMDBClient, CircuitBreaker, TMDBError, TMDBUnavailableError
+
+
+def make_client(handler, **kwargs):
+    kwargs.setdefault("retries", 0)
+    kwargs.setdefault("backoff", 0)
+    return TMDBClient("https://tmdb.test/3", "key", transport=httpx.MockTransport(handler), **kwargs)
+
+
+def open_breaker(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    # Let the reset timeout elapse
+    breaker.opened_at -= breaker.reset_timeout
+
+
+def test_breaker_opens_after_threshold_and_allows_one_trial():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    breaker.opened_at -= 30
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+
+def test_failed_trial_reopens_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    open_breaker(breaker)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+
+def test_get_returns_json_and_sends_api_key():
+    seen = []
+
+    def handler(request):
+        seen.append(request.url)
+        return httpx.Response(200, json={"results": []})
+
+    async def run():
+        client = make_client(handler)
+        try:
+            return await client.search_person("Tom Hanks")
+        finally:
+            await client.close()
+
+    assert asyncio.run(run()) == {"results": []}
+    assert seen[0].params["api_key"] == "key"
+    assert seen[0].params["query"] == "Tom Hanks"
+
+
+def test_retries_transient_statuses():
+    responses = [httpx.Response(503), httpx.Response(429), httpx.Response(200, json={"ok": True})]
+
+    async def run():
+        client = make_client(lambda request: responses.pop(0), retries=2)
+        try:
+            return await client.get("/movie")
+        finally:
+            await client.close()
+
+    assert asyncio.run(run()) == {"ok": True}
+    assert not responses
+
+
+def test_exhausted_retries_count_as_one_failure():
+    breaker = CircuitBreaker(failure_threshold=5)
+
+    async def run():
+        client = make_client(lambda request: httpx.Response(500), retries=1, breaker=breaker)
+        try:
+            await client.get("/movie")
+        finally:
+            await client.close()
+
+    with pytest.raises(TMDBUnavailableError):
+        asyncio.run(run())
+    assert breaker.failures == 1
+
+
+def test_client_errors_are_not_retried_and_do_not_trip_breaker():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(404)
+
+    breaker = CircuitBreaker(failure_threshold=1)
+
+    async def run():
+        client = make_client(handler, retries=3, breaker=breaker)
+        try:
+            await client.get("/person/1")
+        finally:
+            await client.close()
+
+    with pytest.raises(TMDBError):
+        asyncio.run(run())
+    assert len(calls) == 1
+    assert breaker.state == "closed"
+
+
+def test_open_breaker_fails_fast():
+    breaker = CircuitBreaker(failure_threshold=1)
+    breaker.record_failure()
+
+    async def run():
+        client = make_client(lambda request: httpx.Response(200, json={}), breaker=breaker)
+        try:
+            await client.get("/movie")
+        finally:
+            await client.close()
+
+    with pytest.raises(TMDBUnavailableError):
+        asyncio.run(run())
+
+
+def test_cancelled_trial_releases_breaker():
+    breaker = CircuitBreaker(failure_threshold=1)
+    open_breaker(breaker)
+
+    async def run():
+        request_started = asyncio.Event()
+
+        async def handler(request):
+            request_started.set()
+            await asyncio.sleep(10)
+            return httpx.Response(200, json={})
+
+        client = make_client(handler, breaker=breaker)
+        try:
+            trial = asyncio.create_task(client.get("/movie"))
+            await request_started.wait()
+            trial.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await trial
+        finally:
+            await client.close()
+
+    asyncio.run(run())
+    # The breaker stays half-open and lets the next trial through
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+
+
+def test_unexpected_error_in_trial_counts_as_failure():
+    breaker = CircuitBreaker(failure_threshold=1)
+    open_breaker(breaker)
+
+    def handler(request):
+        raise httpx.DecodingError("bad payload")
+
+    async def run():
+        client = make_client(handler, breaker=breaker)
+        try:
+            await client.get("/movie")
+        finally:
+            await client.close()
+
+    with pytest.raises(httpx.DecodingError):
+        asyncio.run(run())
+    assert breaker.state == "open"
+    assert not breaker._trial_in_flight
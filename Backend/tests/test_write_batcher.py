@@ -0,0 +1,110 @@
+import asyncio
+import pytest
+from write_batcher import WriteBatcher, QueueFullError
+
+
+class FakeTx:
+    def __init__(self, graph):
+        self.graph = graph
+        self.rows = []
+
+    def run(self, cypher, rows):
+        if any(row.get("props", row).get("name") == "bad" for row in rows):
+            raise RuntimeError("constraint violated")
+        self.rows = rows
+        return self
+
+    def data(self):
+        return [{"idx": row["idx"], "name": row.get("props", row).get("name")} for row in self.rows]
+
+
+class FakeGraph:
+    """Commits rows in memory; any transaction holding a row named 'bad' fails."""
+
+    def __init__(self):
+        self.committed = []
+        self.transactions = 0
+
+    def begin(self):
+        return FakeTx(self)
+
+    def commit(self, tx):
+        self.transactions += 1
+        self.committed.extend(row.get("props", row)["name"] for row in tx.rows)
+
+    def rollback(self, tx):
+        pass
+
+
+async def submit_all(batcher, names):
+    return await asyncio.gather(*(batcher.submit("actor", {"name": name}) for name in names),
+                                return_exceptions=True)
+
+
+def run_with_batcher(graph, body, **kwargs):
+    async def run():
+        batcher = WriteBatcher(graph, **kwargs)
+        await batcher.start()
+        try:
+            return await body(batcher)
+        finally:
+            await batcher.stop()
+    return asyncio.run(run())
+
+
+def test_concurrent_writes_share_one_transaction():
+    graph = FakeGraph()
+    results = run_with_batcher(graph, lambda b: submit_all(b, ["a", "b", "c"]), window=0.05)
+    assert [result["name"] for result in results] == ["a", "b", "c"]
+    assert graph.committed == ["a", "b", "c"]
+    assert graph.transactions == 1
+
+
+def test_batch_size_splits_batches():
+    graph = FakeGraph()
+    run_with_batcher(graph, lambda b: submit_all(b, ["a", "b", "c"]), batch_size=2, window=0.05)
+    assert sorted(graph.committed) == ["a", "b", "c"]
+    assert graph.transactions == 2
+
+
+def test_failed_batch_retries_rows_individually():
+    graph = FakeGraph()
+    results = run_with_batcher(graph, lambda b: submit_all(b, ["a", "bad", "c"]), window=0.05)
+    assert results[0]["name"] == "a"
+    assert isinstance(results[1], RuntimeError)
+    assert results[2]["name"] == "c"
+    assert sorted(graph.committed) == ["a", "c"]
+
+
+def test_cancelled_caller_does_not_break_retries():
+    graph = FakeGraph()
+
+    async def body(batcher):
+        bad = asyncio.create_task(batcher.submit("actor", {"name": "bad"}))
+        good = [asyncio.create_task(batcher.submit("actor", {"name": name})) for name in ("b", "c")]
+        # Cancel once the write is queued but before the batch window closes
+        await asyncio.sleep(0.01)
+        bad.cancel()
+        return await asyncio.gather(*good)
+
+    results = run_with_batcher(graph, body, window=0.05)
+    assert [result["name"] for result in results] == ["b", "c"]
+    assert sorted(graph.committed) == ["b", "c"]
+
+
+def test_unknown_kind_is_rejected():
+    with pytest.raises(ValueError):
+        run_with_batcher(FakeGraph(), lambda b: b.submit("studio", {}))
+
+
+def test_full_queue_raises_queue_full():
+    async def body(batcher):
+        # Stop the flusher so nothing drains the queue
+        batcher._flusher.cancel()
+        await batcher.queue.put(("actor", {"name": "a"}, asyncio.get_running_loop().create_future()))
+        with pytest.raises(QueueFullError):
+            await batcher.submit("actor", {"name": "b"})
+        batcher.queue.get_nowait()
+        batcher.queue.task_done()
+
+    run_with_batcher(FakeGraph(), body, max_queue=1, submit_timeout=0.01)
@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import random
+import time
+import httpx
+from profiling import span
+
+# HTTP statuses worth retrying: rate limiting and upstream failures
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TMDBError(Exception):
+    """Raised when TMDB answers with a non-retryable error."""
+
+
+class TMDBUnavailableError(TMDBError):
+    """Raised when TMDB is unreachable or the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Fails fast after repeated upstream failures.
+
+    After `failure_threshold` consecutive failures the breaker opens and every call
+    is rejected for `reset_timeout` seconds. It then lets a single trial call through
+    (half-open); success closes the breaker, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """End a call that neither succeeded nor failed (e.g. it was cancelled)."""
+        self._trial_in_flight = False
+
+
+class TMDBClient:
+    """
+    Shared async TMDB client.
+
+    Uses one pooled keep-alive connection pool, strict connect/read timeouts, a
+    semaphore bounding concurrent upstream calls, retries with full jitter for
+    transient failures and a circuit breaker. Point `base_url` at a local fake
+    server (or pass an httpx `transport`) to test without the real API.
+    """
+
+    def __init__(self, base_url, api_key, connect_timeout=3.0, read_timeout=10.0,
+                 max_connections=20, max_concurrency=10, retries=3, backoff=0.25,
+                 breaker=None, transport=None):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_connections)
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.transport = transport
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client = None
+
+    async def start(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(base_url=self.base_url,
+                                             timeout=self.timeout,
+                                             limits=self.limits,
+                                             transport=self.transport)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def get(self, path, **params):
+        if self._client is None:
+            await self.start()
+        if not self.breaker.allow():
+            raise TMDBUnavailableError("TMDB is temporarily unavailable")
+
+        params = {key: value for key, value in params.items() if value is not None}
+        params["api_key"] = self.api_key
+
+        # Every call allowed through must end in exactly one breaker outcome,
+        # or a half-open trial would keep the breaker shut for good
+        try:
+            response = await self._get_with_retries(path, params)
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        except BaseException:
+            self.breaker.record_failure()
+            raise
+
+        self.breaker.record_success()
+        if response.status_code >= 400:
+            raise TMDBError(f"TMDB returned {response.status_code} for {path}")
+        return response.json()
+
+    async def _get_with_retries(self, path, params):
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    with span("tmdb", path=path, attempt=attempt):
+                        response = await self._client.get(path, params=params)
+                if response.status_code not in RETRY_STATUSES:
+                    break
+                error = TMDBUnavailableError(f"TMDB returned {response.status_code} for {path}")
+                retry_after = response.headers.get("Retry-After")
+            except httpx.TransportError as e:
+                error = TMDBUnavailableError(f"TMDB request to {path} failed: {str(e) or type(e).__name__}")
+                retry_after = None
+
+            if attempt >= self.retries:
+                raise error
+
+            # Full jitter backoff, honouring a short Retry-After from TMDB
+            delay = random.uniform(0, self.backoff * 2 ** attempt)
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, min(float(retry_after), 10.0))
+            logging.warning(f"{str(error)}, retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+        return response
+
+    async def search_person(self, name):
+        return await self.get("/search/person", query=name)
+
+    async def person_details(self, person_id):
+        return await self.get(f"/person/{person_id}", append_to_response="movie_credits")
+
+    async def search_movie(self, title, year=None):
+        return await self.get("/search/movie", query=title, year=year)
@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import time
+from queries import registry
+
+# Kinds of write that can be batched; the Cypher for each lives in queries.py
+# as "batch.<kind>"
+BATCH_KINDS = ("actor", "movie", "link")
+
+
+class QueueFullError(Exception):
+    """Raised when the write queue stays full for longer than the submit timeout."""
+
+
+class WriteBatcher:
+    """
+    Coalesces concurrent create/link requests into UNWIND batches.
+
+    Writes are queued with a future per caller. A single flusher task drains the
+    queue and commits a batch once it holds `batch_size` items or `window` seconds
+    have passed since the first item arrived. If a batch transaction fails, the
+    items are retried one by one so each caller gets its own outcome.
+    """
+
+    def __init__(self, graph, batch_size=100, window=0.02, max_queue=1000, submit_timeout=5.0):
+        self.graph = graph
+        self.batch_size = batch_size
+        self.window = window
+        self.submit_timeout = submit_timeout
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self._flusher = None
+
+    async def start(self):
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._flusher is None:
+            return
+        # Let queued writes finish before shutting down
+        await self.queue.join()
+        self._flusher.cancel()
+        try:
+            await self._flusher
+        except asyncio.CancelledError:
+            pass
+        self._flusher = None
+
+    async def submit(self, kind, payload):
+        if kind not in BATCH_KINDS:
+            raise ValueError(f"Unknown write kind: {kind}")
+        future = asyncio.get_running_loop().create_future()
+        try:
+            # Backpressure: wait for space in the queue, but not forever
+            await asyncio.wait_for(self.queue.put((kind, payload, future)), self.submit_timeout)
+        except asyncio.TimeoutError:
+            raise QueueFullError("Write queue is full, try again later")
+        return await future
+
+    async def _run(self):
+        while True:
+            first = await self.queue.get()
+            batch = [first]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                await self._flush(batch)
+            except Exception as e:
+                logging.error(f"Write batch flush failed: {str(e)}")
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def _flush(self, batch):
+        by_kind = {}
+        for item in batch:
+            by_kind.setdefault(item[0], []).append(item)
+
+        for kind, items in by_kind.items():
+            rows = [self._row(kind, idx, payload) for idx, (_, payload, _) in enumerate(items)]
+            try:
+                results = await asyncio.to_thread(self._commit, kind, rows)
+            except Exception as e:
+                logging.warning(f"Batched {kind} write of {len(items)} failed, retrying individually: {str(e)}")
+                await self._flush_individually(kind, items)
+                continue
+
+            self._resolve(items, results)
+            logging.info(f"Flushed {len(items)} batched {kind} writes")
+
+    async def _flush_individually(self, kind, items):
+        for _, payload, future in items:
+            try:
+                results = await asyncio.to_thread(self._commit, kind, [self._row(kind, 0, payload)])
+            except Exception as e:
+                # The caller may have given up (disconnect or timeout) already
+                if not future.done():
+                    future.set_exception(e)
+                continue
+            self._resolve([(kind, payload, future)], results)
+
+    def _commit(self, kind, rows):
+        tx = self.graph.begin()
+        try:
+            results = tx.run(registry.cypher(f"batch.{kind}"), rows=rows).data()
+            self.graph.commit(tx)
+        except Exception:
+            self.graph.rollback(tx)
+            raise
+        return results
+
+    @staticmethod
+    def _row(kind, idx, payload):
+        if kind == "link":
+            return {"idx": idx, **payload}
+        return {"idx": idx, "props": payload}
+
+    @staticmethod
+    def _resolve(items, results):
+        by_idx = {result["idx"]: result for result in results}
+        for idx, (_, payload, future) in enumerate(items):
+            if not future.done():
+                future.set_result(by_idx.get(idx, {}))
@@ -34,7 +34,7 @@ def import_csv_to_neo4j(csv_file):
                 # Create or merge Movie node
                 movie_node = Node("Movie", 
                                   title=row['Movie Title'], 
-                                  year=row['Year'])
+                                  year=int(row['Year']) if row['Year'] else None)
                 graph.merge(movie_node, "Movie", "title")
                 
                 # Create ACTED_IN relationship